@@ -1,4 +1,4 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 import os
 
 # Importar los blueprints
@@ -8,6 +8,10 @@ from routes.keyword_position import keyword_position_bp
 from routes.thumbnail_comparison import thumbnail_comparison_bp
 from routes.video_activity import video_activity_bp
 from routes.keyword_research import keyword_research_bp  # Nuevo
+from routes.metrics import metrics_bp
+from routes.jobs import jobs_bp
+from routes.thumbnails import thumbnails_bp
+from services import quota
 
 app = Flask(__name__)
 
@@ -18,11 +22,29 @@ app.register_blueprint(keyword_position_bp)
 app.register_blueprint(thumbnail_comparison_bp)
 app.register_blueprint(video_activity_bp)
 app.register_blueprint(keyword_research_bp)  # Nuevo
+app.register_blueprint(metrics_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(thumbnails_bp)
+
+# Registrar el consumo de cuota de cada petición por funcionalidad (blueprint)
+@app.before_request
+def start_quota_ledger():
+    quota.start_request(request.blueprint or 'index')
+
+@app.teardown_request
+def end_quota_ledger(exception=None):
+    quota.end_request()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    from config import JOB_WORKERS
+    from services.jobs import start_worker_processes, stop_worker_processes
+    job_supervisor = start_worker_processes(JOB_WORKERS)
+    try:
+        port = int(os.environ.get('PORT', 8080))
+        app.run(host='0.0.0.0', port=port, debug=False)
+    finally:
+        stop_worker_processes(job_supervisor)
\ No newline at end of file
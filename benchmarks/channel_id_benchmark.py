@@ -0,0 +1,175 @@
+"""
+Micro-benchmark de la extracción del channel ID del HTML de una página.
+
+Mide el tiempo de CPU por resolución de:
+
+- "8 pasadas": la implementación anterior, un re.findall por patrón sobre la
+  página completa, con las expresiones compiladas en cada llamada y cada
+  coincidencia validada de nuevo con es_channel_id_valido.
+- "1 pasada": channel_extractor.buscar_channel_id sobre la página completa.
+- "streaming": channel_extractor.escanear_pagina leyendo la página en bloques
+  y deteniéndose en la primera coincidencia definitiva.
+
+Las páginas se leen de benchmarks/fixtures/*.html (los nombres que empiezan por
+"channel" o "video" indican el tipo). Para guardar una página real:
+
+    python benchmarks/channel_id_benchmark.py --save https://www.youtube.com/@canal channel_canal
+
+Las fixtures incluidas (channel_synthetic_*.html, video_synthetic_*.html) NO son
+capturas: son páginas construidas a mano con la estructura de una página de canal
+y una de video (scripts ytcfg, ytInitialPlayerResponse, ytInitialData con IDs de
+otros canales como señuelo), de 600-900 KB. Sirven para comparar los métodos
+entre sí, pero sus tiempos no sustituyen a los de páginas reales guardadas con
+--save, que deberían añadirse junto a ellas.
+
+Si no hay fixtures se generan páginas sintéticas de ~1 MB con la estructura de
+una página de canal, una de video y una en la que el ID solo aparece como
+externalId (el peor caso de la búsqueda patrón a patrón).
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/channel_id_benchmark.py [--runs 20]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services import channel_extractor  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Patrones de la implementación anterior, uno por pasada
+PATRONES_ANTERIORES = [
+    r'"channelId":"(UC[a-zA-Z0-9_-]{22})"',
+    r'<meta property="og:url" content="https://www\.youtube\.com/channel/(UC[a-zA-Z0-9_-]{22})"',
+    r'<link rel="canonical" href="https://www\.youtube\.com/channel/(UC[a-zA-Z0-9_-]{22})"',
+    r'"browseEndpoint":{"browseId":"(UC[a-zA-Z0-9_-]{22})"',
+    r'"externalId":"(UC[a-zA-Z0-9_-]{22})"',
+    r'channel/(UC[a-zA-Z0-9_-]{22})',
+    r'"CHANNEL_ID":"(UC[a-zA-Z0-9_-]{22})"',
+    r'"channelMetadataRenderer":{"title":"[^"]*","description":"[^"]*","rssUrl":"[^"]*","externalId":"(UC[a-zA-Z0-9_-]{22})"',
+]
+
+def extraccion_ocho_pasadas(contenido):
+    """Implementación anterior de obtener_id_desde_contenido_pagina (sin la descarga)"""
+    for patron in PATRONES_ANTERIORES:
+        coincidencias = re.findall(re.compile(patron), contenido)
+        for coincidencia in coincidencias:
+            channel_id = coincidencia if isinstance(coincidencia, str) else coincidencia[0]
+            if channel_extractor.es_channel_id_valido(channel_id):
+                return channel_id
+    return None
+
+def extraccion_una_pasada(contenido):
+    encontrado = channel_extractor.buscar_channel_id(contenido)
+    return encontrado[1] if encontrado else None
+
+class RespuestaSimulada:
+    """Respuesta de requests mínima que entrega el contenido por bloques"""
+    encoding = 'utf-8'
+
+    def __init__(self, datos):
+        self.datos = datos
+
+    def iter_content(self, chunk_size):
+        for inicio in range(0, len(self.datos), chunk_size):
+            yield self.datos[inicio:inicio + chunk_size]
+
+def extraccion_streaming(datos):
+    return channel_extractor.escanear_pagina(RespuestaSimulada(datos))[0]
+
+def pagina_sintetica(tipo, channel_id='UCabcdefghijklmnopqrstuv', tamano=1_200_000):
+    """Página con la estructura aproximada de YouTube: cabecera, scripts y ytInitialData"""
+    otros = [f"UC{str(i).zfill(22)}" for i in range(200)]
+    relleno = json.dumps({'responseContext': {'serviceTrackingParams': [
+        {'service': 'GFEEDBACK', 'params': [{'key': f'k{i}', 'value': 'v' * 40} for i in range(40)]}
+    ]}})
+    cabecera = '<!DOCTYPE html><html><head><title>YouTube</title>'
+    if tipo == 'channel':
+        cabecera += f'<meta property="og:url" content="https://www.youtube.com/channel/{channel_id}">'
+        cabecera += f'<link rel="canonical" href="https://www.youtube.com/channel/{channel_id}">'
+    cabecera += '</head><body>'
+    scripts = ''.join(f'<script nonce="x">var ytcfg{i} = {relleno};</script>' for i in range(80))
+    enlaces = ''.join(f'{{"browseEndpoint":{{"canonicalBaseUrl":"/channel/{otro}"}}}}' for otro in otros)
+    # En las páginas sin "channelId" solo aparece el externalId de los metadatos
+    clave = 'externalId' if tipo == 'metadata' else 'channelId'
+    datos_iniciales = f'var ytInitialData = {{"contents":[{enlaces}],"metadata":{{"{clave}":"{channel_id}"}}}};'
+    pagina = cabecera + scripts + f'<script nonce="x">{datos_iniciales}</script>'
+    pagina += 'x' * max(tamano - len(pagina), 0) + '</body></html>'
+    return pagina
+
+def cargar_fixtures():
+    fixtures = []
+    for ruta in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        nombre = os.path.basename(ruta)
+        if '_synthetic_' in nombre:
+            nombre += ' (sintética)'
+        with open(ruta, encoding='utf-8', errors='replace') as f:
+            fixtures.append((nombre, f.read()))
+    if not fixtures:
+        fixtures = [('channel (sintética)', pagina_sintetica('channel')),
+                    ('video (sintética)', pagina_sintetica('video')),
+                    ('sin channelId (sintética)', pagina_sintetica('metadata'))]
+    return fixtures
+
+def guardar_fixture(url, nombre):
+    import requests
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    respuesta = requests.get(url, headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept-Language': 'en-US,en;q=0.5',
+    }, timeout=15)
+    respuesta.raise_for_status()
+    ruta = os.path.join(FIXTURES_DIR, f"{nombre}.html")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(respuesta.text)
+    print(f"Guardado {ruta} ({len(respuesta.text)} caracteres)")
+
+def medir(funcion, argumento, runs):
+    muestras = []
+    for _ in range(runs):
+        inicio = time.process_time()
+        resultado = funcion(argumento)
+        muestras.append(time.process_time() - inicio)
+    return statistics.median(muestras) * 1000, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help='repeticiones por medición (se usa la mediana)')
+    parser.add_argument('--save', nargs=2, metavar=('URL', 'NOMBRE'), help='descargar una página como fixture')
+    args = parser.parse_args()
+
+    if args.save:
+        guardar_fixture(*args.save)
+        return
+
+    fixtures = cargar_fixtures()
+    for nombre, contenido in fixtures:
+        datos = contenido.encode('utf-8')
+        print(f"{nombre} ({len(datos) / 1024:.0f} KB)")
+        resultados = set()
+        for etiqueta, funcion, argumento in (
+            ('8 pasadas', extraccion_ocho_pasadas, contenido),
+            ('1 pasada', extraccion_una_pasada, contenido),
+            ('streaming', extraccion_streaming, datos),
+        ):
+            tiempo, resultado = medir(funcion, argumento, args.runs)
+            resultados.add(resultado)
+            print(f"  {etiqueta:<12} {tiempo:9.3f} ms CPU  -> {resultado}")
+        if len(resultados) > 1:
+            print("  ¡ATENCIÓN! Los métodos no devuelven el mismo channel ID")
+
+    if all('(sintética)' in nombre for nombre, _ in fixtures):
+        print("\nTodas las páginas son sintéticas: guarda páginas reales con --save para "
+              "medir con el tamaño y la estructura actuales de YouTube")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark del coste de arranque de los servicios de YouTube.
+
+Compara, en procesos nuevos de Python:
+
+- "antes": lo que hacía cada worker al importar los servicios: los mismos
+  imports más cinco llamadas a build('youtube', 'v3', ...) (seo_analyzer,
+  keyword_position, thumbnail_comparison, video_activity y video_analyzer),
+  más un build() por cada resolución de canal en
+  channel_extractor.obtener_id_desde_video.
+- "después": importar los mismos servicios con la factoría de
+  services.youtube_api, que no construye nada al importar, y el coste del
+  primer cliente y de los siguientes.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/startup_benchmark.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BEFORE_IMPORT = """
+import time
+t = time.perf_counter()
+import services.seo_analyzer, services.keyword_position, services.thumbnail_comparison
+import services.video_activity, services.video_analyzer, services.channel_extractor
+from googleapiclient.discovery import build
+for _ in range(5):
+    build('youtube', 'v3', developerKey='benchmark')
+print(time.perf_counter() - t)
+"""
+
+BEFORE_RESOLUTION = """
+import time
+from googleapiclient.discovery import build
+build('youtube', 'v3', developerKey='benchmark')
+t = time.perf_counter()
+for _ in range(20):
+    build('youtube', 'v3', developerKey='benchmark')
+print((time.perf_counter() - t) / 20)
+"""
+
+AFTER_IMPORT = """
+import time
+t = time.perf_counter()
+import services.seo_analyzer, services.keyword_position, services.thumbnail_comparison
+import services.video_activity, services.video_analyzer, services.channel_extractor
+print(time.perf_counter() - t)
+"""
+
+AFTER_FIRST_CLIENT = """
+import time
+from services.youtube_api import get_youtube_client
+t = time.perf_counter()
+get_youtube_client()
+print(time.perf_counter() - t)
+"""
+
+AFTER_RESOLUTION = """
+import time
+from services.youtube_api import get_youtube_client
+get_youtube_client()
+t = time.perf_counter()
+for _ in range(20):
+    get_youtube_client()
+print((time.perf_counter() - t) / 20)
+"""
+
+def run_snippet(code, runs):
+    env = dict(os.environ, YOUTUBE_API_KEY='benchmark', OPENAI_API_KEY='')
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='procesos por medición (se usa la mediana)')
+    args = parser.parse_args()
+
+    rows = [
+        ("Antes:   importar servicios (5 x build)", BEFORE_IMPORT),
+        ("Después: importar servicios", AFTER_IMPORT),
+        ("Después: primer cliente del worker", AFTER_FIRST_CLIENT),
+        ("Antes:   cliente por resolución de canal", BEFORE_RESOLUTION),
+        ("Después: cliente por resolución de canal", AFTER_RESOLUTION),
+    ]
+    for label, code in rows:
+        print(f"{label:<45} {run_snippet(code, args.runs):10.3f} ms")
+
+if __name__ == '__main__':
+    main()
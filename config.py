@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+# Directorio donde se guardan las cachés locales (compartido por todos los workers).
+# Debe ser privado del usuario de la aplicación: se crea con permisos 0700 y se
+# rechaza si pertenece a otro usuario o si otros pueden escribir en él
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'youtube_tools_cache'))
+
+# Región usada para precargar la tabla de categorías de vídeo
+CATEGORY_REGION = os.environ.get('CATEGORY_REGION', 'US')
+
+# Base de datos SQLite (modo WAL) con las cachés persistentes
+CACHE_DB_NAME = os.environ.get('CACHE_DB_NAME', 'cache.sqlite3')
+
+# Caché de respuestas de YouTube Data API
+API_CACHE_ENABLED = os.environ.get('API_CACHE_ENABLED', 'true').lower() == 'true'
+API_CACHE_MAX_BYTES = int(os.environ.get('API_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+# Presupuesto diario de cuota de YouTube Data API (0 desactiva el control).
+# Al superar el umbral, los informes reducen max_results en lugar de agotar la cuota.
+DAILY_QUOTA_BUDGET = int(os.environ.get('DAILY_QUOTA_BUDGET', 10000))
+QUOTA_DEGRADE_THRESHOLD = float(os.environ.get('QUOTA_DEGRADE_THRESHOLD', 0.8))
+QUOTA_DEGRADED_MAX_RESULTS = int(os.environ.get('QUOTA_DEGRADED_MAX_RESULTS', 50))
+
+# Deduplicación de informes idénticos en curso: duración máxima del bloqueo del
+# líder (igual al timeout de gunicorn) y segundos que se comparte su resultado
+SINGLEFLIGHT_LEASE_SECONDS = int(os.environ.get('SINGLEFLIGHT_LEASE_SECONDS', 120))
+SINGLEFLIGHT_RESULT_TTL = int(os.environ.get('SINGLEFLIGHT_RESULT_TTL', 10))
+
+# Trabajos en segundo plano (services/jobs.py): procesos worker lanzados junto a
+# la aplicación, tiempo máximo de un trabajo antes de reintentarlo, segundos que
+# se conservan los resultados, intervalo de sondeo de la cola y cada cuántos
+# segundos se comprueba que los procesos worker siguen vivos
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 900))
+JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 24 * 3600))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.5))
+JOB_SUPERVISE_INTERVAL = float(os.environ.get('JOB_SUPERVISE_INTERVAL', 5))
+
+# Caché de resoluciones URL -> channel ID: los aciertos se conservan 30 días y
+# los fallos solo 10 minutos
+CHANNEL_RESOLUTION_TTL = int(os.environ.get('CHANNEL_RESOLUTION_TTL', 30 * 24 * 3600))
+CHANNEL_RESOLUTION_NEGATIVE_TTL = int(os.environ.get('CHANNEL_RESOLUTION_NEGATIVE_TTL', 10 * 60))
+
+# Pools de conexiones HTTP keep-alive para las peticiones fuera de la API
+# (services/http_sessions.py): número de hosts con pool y conexiones por host.
+# Cada worker de gunicorn atiende 2 hilos; el margen cubre las peticiones
+# concurrentes que lanza un mismo informe (KEYWORD_EXPANSION_WORKERS).
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+
+# Llamadas simultáneas a la Suggest API en la expansión de palabras clave
+KEYWORD_EXPANSION_WORKERS = int(os.environ.get('KEYWORD_EXPANSION_WORKERS', 16))
+
+# Segundos que se conservan los resultados de la investigación de keywords: las
+# exportaciones se sirven de esta caché y coinciden con lo que se mostró
+KEYWORD_SUGGESTIONS_TTL = int(os.environ.get('KEYWORD_SUGGESTIONS_TTL', 3600))
+
+# Seguimiento de posiciones de varias palabras clave a la vez: búsquedas
+# simultáneas y número máximo de palabras clave por lote (cada una cuesta al
+# menos 100 unidades de cuota)
+KEYWORD_POSITION_WORKERS = int(os.environ.get('KEYWORD_POSITION_WORKERS', 4))
+KEYWORD_POSITION_MAX_BATCH = int(os.environ.get('KEYWORD_POSITION_MAX_BATCH', 25))
+
+# Historial de posiciones: pendiente mínima (posiciones por día) para considerar
+# que un canal sube o baja para una palabra clave
+RANK_TREND_THRESHOLD = float(os.environ.get('RANK_TREND_THRESHOLD', 0.1))
+
+# Instantáneas de resultados de búsqueda compartidas por los informes
+# (services/serp_store.py): segundos que se reutilizan las páginas de una
+# búsqueda desde que se descarga la primera
+SERP_SNAPSHOT_TTL = int(os.environ.get('SERP_SNAPSHOT_TTL', 15 * 60))
+
+# Proxy de miniaturas (services/thumbnail_proxy.py): minutos que se recuerda qué
+# archivo corresponde a cada miniatura (pasado ese tiempo se vuelve a descargar
+# de YouTube, por si el creador la ha cambiado) y tamaño máximo de la caché de disco
+THUMBNAIL_INDEX_TTL = int(os.environ.get('THUMBNAIL_INDEX_MINUTES', 10)) * 60
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_MB', 512)) * 1024 * 1024
+
+# Ventanas (días) del análisis de actividad de un video: cada una tiene su
+# propia estimación de visualizaciones, calculada con los mismos comentarios.
+# Se descartan las que no son positivas (dividirían por cero la media diaria)
+ACTIVITY_WINDOWS_DAYS = tuple(
+    days for days in (
+        int(value) for value in os.environ.get('ACTIVITY_WINDOWS_DAYS', '1,7,30,90,365').split(',') if value.strip()
+    ) if days > 0
+)
@@ -3,4 +3,24 @@ import os
 bind = "0.0.0.0:" + os.environ.get("PORT", "8080")
 workers = 2
 threads = 2
-timeout = 120
\ No newline at end of file
+timeout = 120
+
+# Proceso supervisor de los workers que ejecutan los informes lentos en segundo
+# plano (services/jobs.py). Se lanza en on_starting, antes de que el árbitro
+# cree hilos o procesos, y es él (no el árbitro) quien vigila y relanza los
+# workers: el reap_workers del árbitro recoge con waitpid(-1) a todos sus hijos,
+# incluido el supervisor, pero no a los nietos. El supervisor nunca sale con los
+# códigos 3 o 4, que el árbitro interpreta como fallo de arranque de un worker.
+_job_supervisor = None
+
+def on_starting(server):
+    global _job_supervisor
+    from config import JOB_WORKERS
+    from services.jobs import start_worker_processes
+    _job_supervisor = start_worker_processes(JOB_WORKERS)
+    server.log.info(f"Lanzado el supervisor de {JOB_WORKERS} workers de trabajos (pid {_job_supervisor.pid})")
+
+def on_exit(server):
+    if _job_supervisor is not None:
+        from services.jobs import stop_worker_processes
+        stop_worker_processes(_job_supervisor)
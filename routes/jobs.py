@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from services.jobs import get_job
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+@jobs_bp.route('/<job_id>')
+def job_status(job_id):
+    """Estado de un trabajo en segundo plano, consultado periódicamente por las páginas de espera"""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'id': job_id, 'status': 'not_found'}), 404
+    
+    return jsonify({
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'error': job['error']
+    })
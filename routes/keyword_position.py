@@ -1,6 +1,11 @@
-from flask import Blueprint, request, render_template, redirect, url_for
+from flask import Blueprint, request, render_template, redirect, url_for, Response, stream_with_context, jsonify
 from services.keyword_position import search_channel_position, format_number, format_date
+from services.keyword_position import iter_channel_positions, get_channel_info, normalize_keywords
+from services.quota import get_request_usage
+from config import KEYWORD_POSITION_MAX_BATCH
 from services.channel_extractor import obtener_id_canal
+from services import singleflight, rank_history
+import time
 import logging
 
 keyword_position_bp = Blueprint('keyword_position', __name__, url_prefix='/keyword-position')
@@ -11,6 +16,8 @@ def keyword_position():
         keyword = request.form.get('keyword', '').strip()
         channel_url = request.form.get('channel_url', '').strip()
         max_results = int(request.form.get('max_results', 100))
+        # 0 = analizar todos los resultados; N = detenerse al encontrar N videos del canal
+        max_hits = int(request.form.get('max_hits', 0)) or None
         
         # Validaciones básicas
         if not keyword:
@@ -36,7 +43,8 @@ def keyword_position():
             return redirect(url_for('keyword_position.generate_report', 
                                   keyword=keyword, 
                                   channel_id=channel_id, 
-                                  max_results=max_results))
+                                  max_results=max_results,
+                                  hits=max_hits))
                                   
         except Exception as e:
             error_msg = f"Error al procesar la URL del canal: {str(e)}"
@@ -49,7 +57,11 @@ def keyword_position():
 @keyword_position_bp.route('/report/<keyword>/<channel_id>/<int:max_results>')
 def generate_report(keyword, channel_id, max_results=100):
     try:
-        result = search_channel_position(keyword, channel_id, max_results)
+        max_hits = request.args.get('hits', type=int) or None
+        
+        # Las peticiones simultáneas del mismo informe comparten una sola búsqueda
+        key = singleflight.make_key('keyword_position_report', keyword, channel_id, max_results, max_hits)
+        result = singleflight.do(key, search_channel_position, keyword, channel_id, max_results, max_hits)
         
         return render_template('keyword_position/report.html',
                              result=result,
@@ -62,4 +74,116 @@ def generate_report(keyword, channel_id, max_results=100):
         return render_template('keyword_position/error.html', 
                              error=error_message, 
                              keyword=keyword, 
-                             channel_id=channel_id)
\ No newline at end of file
+                             channel_id=channel_id)
+
+@keyword_position_bp.route('/batch', methods=['GET', 'POST'])
+def batch():
+    """Formulario para comprobar varias palabras clave de un mismo canal a la vez"""
+    if request.method == 'POST':
+        keywords = normalize_keywords(request.form.get('keywords', '').splitlines())
+        channel_url = request.form.get('channel_url', '').strip()
+        max_results = int(request.form.get('max_results', 100))
+        max_hits = int(request.form.get('max_hits', 0)) or None
+        
+        if not keywords:
+            return render_template('keyword_position/batch.html',
+                                 error="Introduce al menos una palabra clave (una por línea).",
+                                 max_batch=KEYWORD_POSITION_MAX_BATCH)
+        
+        if not channel_url:
+            return render_template('keyword_position/batch.html',
+                                 error="La URL del canal es obligatoria.",
+                                 max_batch=KEYWORD_POSITION_MAX_BATCH)
+        
+        try:
+            # El canal se resuelve una sola vez para todo el lote
+            channel_id = obtener_id_canal(channel_url)
+            if not channel_id:
+                error_msg = f"No se pudo extraer el ID del canal de la URL proporcionada: {channel_url}. "
+                error_msg += "Verifica que sea una URL válida de YouTube (canal, video, etc.)"
+                return render_template('keyword_position/batch.html', error=error_msg,
+                                     max_batch=KEYWORD_POSITION_MAX_BATCH)
+            
+            return redirect(url_for('keyword_position.batch_report',
+                                  channel_id=channel_id,
+                                  k=keywords,
+                                  max_results=max_results,
+                                  hits=max_hits))
+        
+        except Exception as e:
+            error_msg = f"Error al procesar la URL del canal: {str(e)}"
+            logging.error(error_msg)
+            return render_template('keyword_position/batch.html', error=error_msg,
+                                 max_batch=KEYWORD_POSITION_MAX_BATCH)
+    
+    return render_template('keyword_position/batch.html', max_batch=KEYWORD_POSITION_MAX_BATCH)
+
+@keyword_position_bp.route('/batch/<channel_id>')
+def batch_report(channel_id):
+    """
+    Informe de varias palabras clave: envía la cabecera con la información del
+    canal y después una fila por palabra clave en cuanto termina su búsqueda
+    """
+    keywords = normalize_keywords(request.args.getlist('k'))
+    max_results = request.args.get('max_results', 100, type=int)
+    max_hits = request.args.get('hits', type=int) or None
+    
+    if not keywords:
+        return redirect(url_for('keyword_position.batch'))
+    
+    def generate():
+        channel_info = get_channel_info(channel_id)
+        yield render_template('keyword_position/batch_stream_start.html',
+                            channel_id=channel_id,
+                            channel_info=channel_info,
+                            keywords=keywords,
+                            max_results=max_results,
+                            max_hits=max_hits,
+                            format_number=format_number)
+        
+        rows = []
+        for row in iter_channel_positions(keywords, channel_id, max_results, max_hits, channel_info):
+            rows.append(row)
+            yield render_template('keyword_position/batch_row.html',
+                                row=row,
+                                channel_id=channel_id,
+                                max_results=max_results,
+                                max_hits=max_hits,
+                                format_number=format_number)
+        
+        ranked = [row for row in rows if row.get('best_position')]
+        yield render_template('keyword_position/batch_stream_end.html',
+                            rows=rows,
+                            ranked=ranked,
+                            errors=[row for row in rows if row.get('error')],
+                            quota=get_request_usage())
+    
+    response = Response(stream_with_context(generate()), mimetype='text/html')
+    # Evitar que proxies intermedios acumulen la respuesta antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@keyword_position_bp.route('/history')
+def history():
+    """
+    Variación y tendencia de las posiciones guardadas en los últimos `days` días,
+    filtradas por channel_id y/o keyword. Con ambos filtros y series=1 incluye
+    además la serie completa de observaciones.
+    """
+    keyword = request.args.get('keyword') or None
+    channel_id = request.args.get('channel_id') or None
+    days = request.args.get('days', 30, type=int)
+    since = int(time.time()) - days * 86400
+    
+    try:
+        data = {
+            'since': since,
+            'movements': rank_history.get_movements(keyword=keyword, channel_id=channel_id, since=since)
+        }
+        if keyword and channel_id and request.args.get('series'):
+            data['series'] = rank_history.get_history(keyword=keyword, channel_id=channel_id, since=since)
+        return jsonify(data)
+    except Exception as e:
+        logging.error(f"Error consultando el historial de posiciones: {str(e)}")
+        return jsonify({'error': str(e)}), 500
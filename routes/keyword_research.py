@@ -1,4 +1,4 @@
-from flask import Blueprint, request, render_template, redirect, url_for, make_response
+from flask import Blueprint, request, render_template, redirect, url_for, Response
 import logging
 
 # Configurar logging para debug
@@ -28,7 +28,9 @@ def keyword_research():
             # Escapar caracteres problemáticos para URL
             safe_keyword = keyword.replace('/', '_').replace('?', '_').replace('#', '_')
             
-            return redirect(url_for('keyword_research.generate_results', keyword=safe_keyword))
+            # La expansión completa es opcional: la búsqueda simple es una sola llamada
+            expand = 1 if request.form.get('expand') else None
+            return redirect(url_for('keyword_research.generate_results', keyword=safe_keyword, expand=expand))
         
         return render_template('keyword_research/index.html')
         
@@ -41,34 +43,25 @@ def keyword_research():
 def generate_results(keyword):
     try:
         # Importar aquí para evitar importaciones circulares
-        from services.keyword_research import search_keyword_suggestions, format_suggestions_for_export
+        from services.keyword_research import get_keyword_suggestions
         
         logging.info(f"Generando resultados para keyword: {keyword}")
         
-        # Buscar sugerencias con manejo de errores robusto
-        result = search_keyword_suggestions(keyword)
+        # Buscar sugerencias con manejo de errores robusto (se guardan para las exportaciones)
+        result = get_keyword_suggestions(keyword, expand=bool(request.args.get('expand')))
         
         # Verificar que tenemos un resultado válido
         if not result or not isinstance(result, dict):
-            logging.error("Resultado inválido de search_keyword_suggestions")
+            logging.error("Resultado inválido de get_keyword_suggestions")
             return render_template('keyword_research/error.html', 
                                  error="Error procesando la búsqueda de sugerencias", 
                                  keyword=keyword)
         
-        # Preparar datos para exportación solo si hay sugerencias
-        export_data = None
-        if result.get('has_suggestions', False) and result.get('suggestions'):
-            try:
-                export_data = format_suggestions_for_export(result['suggestions'], keyword)
-            except Exception as export_error:
-                logging.warning(f"Error preparando datos de exportación: {str(export_error)}")
-                export_data = None
-        
+        # Las exportaciones se generan al descargarlas, en el formato pedido
         logging.info(f"Renderizando resultados. Sugerencias: {result.get('total_suggestions', 0)}")
         
         return render_template('keyword_research/results.html',
-                             result=result,
-                             export_data=export_data)
+                             result=result)
                              
     except ImportError as e:
         logging.error(f"Error de importación: {str(e)}")
@@ -89,48 +82,34 @@ def export_suggestions(keyword, format_type):
     """
     try:
         # Importar aquí para evitar problemas
-        from services.keyword_research import search_keyword_suggestions, format_suggestions_for_export
+        from services.keyword_research import get_keyword_suggestions, iter_suggestions_export, EXPORT_FORMATS
         
         logging.info(f"Exportando sugerencias para '{keyword}' en formato '{format_type}'")
         
         # Validar formato
-        if format_type not in ['txt', 'csv', 'json']:
+        if format_type not in EXPORT_FORMATS:
             return render_template('keyword_research/error.html', 
-                                 error="Formato de exportación no válido. Use: txt, csv o json", 
+                                 error="Formato de exportación no válido. Use: txt, csv, json o jsonl", 
                                  keyword=keyword)
         
-        # Volver a buscar las sugerencias
-        result = search_keyword_suggestions(keyword)
+        # Las mismas sugerencias que se mostraron en los resultados (desde la caché)
+        result = get_keyword_suggestions(keyword, expand=bool(request.args.get('expand')))
         
         if not result or not result.get('has_suggestions', False):
             return render_template('keyword_research/error.html', 
                                  error="No hay sugerencias para exportar", 
                                  keyword=keyword)
         
-        # Formatear datos para exportación
-        export_data = format_suggestions_for_export(result['suggestions'], keyword)
-        
         # Preparar nombre de archivo seguro
         safe_filename = keyword.replace(' ', '_').replace('/', '_').replace('\\', '_')
         safe_filename = ''.join(c for c in safe_filename if c.isalnum() or c in ('_', '-'))
         
-        if format_type == 'txt':
-            response = make_response(export_data['text'])
-            response.headers['Content-Type'] = 'text/plain; charset=utf-8'
-            response.headers['Content-Disposition'] = f'attachment; filename="sugerencias_{safe_filename}.txt"'
-            return response
-            
-        elif format_type == 'csv':
-            response = make_response(export_data['csv'])
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-            response.headers['Content-Disposition'] = f'attachment; filename="sugerencias_{safe_filename}.csv"'
-            return response
-            
-        elif format_type == 'json':
-            response = make_response(export_data['json'])
-            response.headers['Content-Type'] = 'application/json; charset=utf-8'
-            response.headers['Content-Disposition'] = f'attachment; filename="sugerencias_{safe_filename}.json"'
-            return response
+        # Solo se genera el formato pedido, por bloques y directamente en la respuesta
+        _, content_type = EXPORT_FORMATS[format_type]
+        response = Response(iter_suggestions_export(result['suggestions'], keyword, format_type),
+                            content_type=content_type)
+        response.headers['Content-Disposition'] = f'attachment; filename="sugerencias_{safe_filename}.{format_type}"'
+        return response
                                  
     except ImportError as e:
         logging.error(f"Error de importación en export: {str(e)}")
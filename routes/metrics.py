@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify
+from services.quota import get_quota_report
+from services.http_sessions import get_http_stats
+from services.serp_store import get_serp_stats
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/metrics')
+
+@metrics_bp.route('/')
+def metrics():
+    """
+    Métricas de uso de YouTube Data API: consumo de cuota del día (compartido por
+    todos los workers) y contadores de la caché de respuestas (de este worker),
+    más la reutilización de conexiones HTTP fuera de la API y de las páginas de
+    búsqueda compartidas entre informes (de este worker)
+    """
+    # Importar aquí para no cargar googleapiclient al arrancar la aplicación
+    from services.api_cache import get_cache_stats
+    
+    return jsonify({
+        'quota': get_quota_report(),
+        'api_cache': get_cache_stats(),
+        'http_sessions': get_http_stats(),
+        'serp_snapshots': get_serp_stats()
+    })
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, render_template, redirect, url_for, jsonify
-from services.seo_analyzer import search_videos, calculate_average_duration, count_unique_channels
+from flask import Blueprint, request, render_template, redirect, url_for, jsonify, Response, stream_with_context
+from services.seo_analyzer import search_videos, iter_video_batches, calculate_average_duration, count_unique_channels
 from services.seo_analyzer import get_channel_stats, categorize_videos_by_age, calculate_total_stats
 from services.seo_analyzer import format_number, format_date, format_duration
-from services.video_analyzer import analyze_video_structure, format_analysis_for_display
+from services.video_analyzer import format_analysis_for_display
+from services.quota import get_request_usage
+from services import singleflight, jobs
 import re
 import logging
 
@@ -12,76 +14,132 @@ seo_bp = Blueprint('seo', __name__, url_prefix='/seo')
 def seo():
     if request.method == 'POST':
         keyword = request.form['keyword']
+        if 'stream' in request.form:
+            return redirect(url_for('seo.generate_report', keyword=keyword, stream=1))
         return redirect(url_for('seo.generate_report', keyword=keyword))
     
     return render_template('seo/index.html')
 
 @seo_bp.route('/report/<keyword>')
 def generate_report(keyword):
+    # Modo streaming: la página se envía a medida que llegan los videos
+    if request.args.get('stream') == '1':
+        return stream_report(keyword)
+    
     try:
-        videos = search_videos(keyword, max_results=20)
+        # Las peticiones simultáneas del mismo informe comparten una sola búsqueda
+        videos = singleflight.do(singleflight.make_key('seo_report', keyword, 20),
+                                 search_videos, keyword, max_results=20)
         
         if videos:
-            # Añadir video_id extraído de la URL para cada video
-            for i, video in enumerate(videos):
-                if 'video_url' in video:
-                    # Extraer video ID de diferentes formatos de URL
-                    video_id = extract_video_id(video['video_url'])
-                    video['video_id'] = video_id
-                    
-                    # Debug logging
-                    print(f"Video {i+1}: {video.get('title', 'Sin título')[:50]}...")
-                    print(f"  URL: {video['video_url']}")
-                    print(f"  Video ID: {video_id}")
-                    print(f"  Tiene ID: {'✅' if video_id else '❌'}")
-                else:
-                    video['video_id'] = None
-                    print(f"Video {i+1}: No tiene video_url")
-            
-            avg_views = sum(video['views'] for video in videos) / len(videos)
-            avg_likes = sum(video['likes'] for video in videos) / len(videos)
-            avg_comments = sum(video['comments'] for video in videos) / len(videos)
-            avg_duration = calculate_average_duration(videos)
-            unique_channels_count = count_unique_channels(videos)
-            channel_stats = get_channel_stats(videos)
-            last_6_months, last_year, older_than_year = categorize_videos_by_age(videos)
-            total_stats = calculate_total_stats(videos)
+            assign_video_ids(videos)
             
             # Contar videos con análisis disponible
             videos_with_analysis = len([v for v in videos if v.get('video_id')])
             print(f"📊 Total videos: {len(videos)}")
             print(f"🧠 Videos con análisis disponible: {videos_with_analysis}")
-            
-        else:
-            avg_views = avg_likes = avg_comments = 0
-            avg_duration = None
-            unique_channels_count = 0
-            channel_stats = {}
-            last_6_months = last_year = older_than_year = []
-            total_stats = {'total_views': 0, 'total_likes': 0, 'total_comments': 0}
 
         return render_template('seo/report.html',
             keyword=keyword,
             videos=videos,
-            avg_views_videos=avg_views,
-            avg_likes_videos=avg_likes,
-            avg_comments_videos=avg_comments,
-            avg_duration=avg_duration,
-            unique_channels_count=unique_channels_count,
-            channel_stats=channel_stats,
-            last_6_months=last_6_months,
-            last_year=last_year,
-            older_than_year=older_than_year,
-            total_stats=total_stats,
+            quota=get_request_usage(),
             format_number=format_number,
             format_date=format_date,
-            format_duration=format_duration
+            format_duration=format_duration,
+            **build_report_context(videos)
         )
     except Exception as e:
         error_message = f"Error al generar el informe: {str(e)}"
         logging.error(error_message)
         return render_template('seo/error.html', error=error_message, keyword=keyword)
 
+def stream_report(keyword):
+    """
+    Envía primero la estructura de la página, después las tarjetas de cada lote de
+    videos según llegan de la API y, al final, las estadísticas agregadas
+    """
+    formatters = {
+        'format_number': format_number,
+        'format_date': format_date,
+        'format_duration': format_duration
+    }
+    
+    def generate():
+        yield render_template('seo/report_stream_start.html', keyword=keyword)
+        
+        videos = []
+        error_message = None
+        try:
+            for batch in iter_video_batches(keyword, max_results=20):
+                assign_video_ids(batch)
+                videos.extend(batch)
+                yield render_template('seo/report.html', videos=batch, **formatters)
+        except Exception as e:
+            error_message = f"Error al generar el informe: {str(e)}"
+            logging.error(error_message)
+        
+        yield render_template('seo/report_stream_end.html',
+            keyword=keyword,
+            videos=videos,
+            error=error_message,
+            quota=get_request_usage(),
+            **formatters,
+            **build_report_context(videos)
+        )
+    
+    response = Response(stream_with_context(generate()), mimetype='text/html')
+    # Evitar que proxies intermedios acumulen la respuesta antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def assign_video_ids(videos):
+    """Añade a cada video el video_id extraído de su URL"""
+    for i, video in enumerate(videos):
+        if 'video_url' in video:
+            # Extraer video ID de diferentes formatos de URL
+            video_id = extract_video_id(video['video_url'])
+            video['video_id'] = video_id
+            
+            # Debug logging
+            print(f"Video {i+1}: {video.get('title', 'Sin título')[:50]}...")
+            print(f"  URL: {video['video_url']}")
+            print(f"  Video ID: {video_id}")
+            print(f"  Tiene ID: {'✅' if video_id else '❌'}")
+        else:
+            video['video_id'] = None
+            print(f"Video {i+1}: No tiene video_url")
+
+def build_report_context(videos):
+    """Calcula las estadísticas agregadas del informe"""
+    if not videos:
+        return {
+            'avg_views_videos': 0,
+            'avg_likes_videos': 0,
+            'avg_comments_videos': 0,
+            'avg_duration': None,
+            'unique_channels_count': 0,
+            'channel_stats': {},
+            'last_6_months': [],
+            'last_year': [],
+            'older_than_year': [],
+            'total_stats': {'total_views': 0, 'total_likes': 0, 'total_comments': 0}
+        }
+    
+    last_6_months, last_year, older_than_year = categorize_videos_by_age(videos)
+    return {
+        'avg_views_videos': sum(video['views'] for video in videos) / len(videos),
+        'avg_likes_videos': sum(video['likes'] for video in videos) / len(videos),
+        'avg_comments_videos': sum(video['comments'] for video in videos) / len(videos),
+        'avg_duration': calculate_average_duration(videos),
+        'unique_channels_count': count_unique_channels(videos),
+        'channel_stats': get_channel_stats(videos),
+        'last_6_months': last_6_months,
+        'last_year': last_year,
+        'older_than_year': older_than_year,
+        'total_stats': calculate_total_stats(videos)
+    }
+
 def extract_video_id(url):
     """
     Extrae el video ID de diferentes formatos de URL de YouTube
@@ -109,16 +167,52 @@ def extract_video_id(url):
 @seo_bp.route('/analyze-video/<video_id>')
 def analyze_video(video_id):
     """
-    Endpoint para analizar la estructura de un video específico
+    Endpoint para analizar la estructura de un video específico.
+    El análisis se encola y la página consulta su estado hasta que termina.
     """
     try:
         video_title = request.args.get('title', '')
         
-        print(f"🧠 Analizando video: {video_id}")
+        print(f"🧠 Encolando análisis del video: {video_id}")
         print(f"📝 Título: {video_title}")
         
-        # Analizar el video
-        analysis_result = analyze_video_structure(video_id, video_title)
+        job_id = jobs.submit('analyze_video_structure', video_id, video_title)
+        
+        return render_template('jobs/pending.html',
+                             title='Analizando video',
+                             icon='🧠',
+                             message=f'Analizando la estructura de "{video_title or video_id}" con IA. Esto puede tardar hasta un minuto.',
+                             status_url=url_for('jobs.job_status', job_id=job_id),
+                             result_url=url_for('seo.analysis_result', video_id=video_id, job_id=job_id, title=video_title))
+            
+    except Exception as e:
+        error_msg = f"Error inesperado: {str(e)}"
+        print(f"❌ {error_msg}")
+        return render_template('seo/analysis_error.html', 
+                             error=error_msg,
+                             video_id=video_id)
+
+@seo_bp.route('/analyze-video/<video_id>/result/<job_id>')
+def analysis_result(video_id, job_id):
+    """
+    Muestra el resultado del análisis en segundo plano de un video
+    """
+    try:
+        job = jobs.get_job(job_id)
+        
+        if not job:
+            return render_template('seo/analysis_error.html', 
+                                 error="El análisis no existe o ha caducado. Vuelve a lanzarlo desde el reporte.",
+                                 video_id=video_id)
+        
+        if job['status'] in ('queued', 'running'):
+            return redirect(url_for('seo.analyze_video', video_id=video_id, title=request.args.get('title', '')))
+        
+        analysis_result = job['result']
+        if job['status'] == 'failed' or not analysis_result:
+            return render_template('seo/analysis_error.html', 
+                                 error=job['error'] or "Error desconocido en el análisis",
+                                 video_id=video_id)
         
         if analysis_result['success']:
             # Formatear para mostrar
@@ -0,0 +1,30 @@
+from flask import Blueprint, redirect, send_file, abort, url_for
+from services.thumbnail_proxy import is_valid_request, get_thumbnail, source_url
+
+thumbnails_bp = Blueprint('thumbnails', __name__, url_prefix='/thumbnails')
+
+@thumbnails_bp.route('/<video_id>/<variant>.jpg')
+def thumbnail(video_id, variant):
+    """
+    Miniatura de un video servida desde la caché de disco local, con ETag (hash
+    del contenido) y Cache-Control: no-cache. La URL no cambia cuando el creador
+    cambia la miniatura, así que el navegador revalida en cada visita: si el
+    contenido es el mismo recibe un 304 sin salir a i.ytimg.com, y si ha cambiado,
+    la nueva imagen. Si la miniatura no se puede descargar se redirige a la original.
+    """
+    if not is_valid_request(video_id, variant):
+        abort(404)
+
+    cached = get_thumbnail(video_id, variant)
+    if cached is None:
+        return redirect(source_url(video_id, variant))
+
+    path, digest = cached
+    return send_file(path, mimetype='image/jpeg', etag=digest, max_age=0, conditional=True)
+
+@thumbnails_bp.app_template_global()
+def thumbnail_src(video_id, variant, fallback=''):
+    """URL de la miniatura a través del proxy, o `fallback` si el video no tiene un ID válido"""
+    if video_id and is_valid_request(video_id, variant):
+        return url_for('thumbnails.thumbnail', video_id=video_id, variant=variant)
+    return fallback
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, render_template, redirect, url_for
-from services.video_activity import analyze_video_activity
+from services import jobs
 from services.thumbnail_comparison import extract_video_id
 
 video_activity_bp = Blueprint('video_activity', __name__, url_prefix='/video-activity')
@@ -25,22 +25,48 @@ def video_activity():
 
 @video_activity_bp.route('/report/<video_id>')
 def generate_report(video_id):
+    """Encola el análisis de actividad; la página consulta su estado hasta que termina"""
     try:
-        result = analyze_video_activity(video_id)
+        job_id = jobs.submit('analyze_video_activity', video_id)
         
-        # Función helper para formatear números
-        def format_number(num):
-            if num >= 1000000:
-                return f"{num/1000000:.1f}M"
-            elif num >= 1000:
-                return f"{num/1000:.0f}K"
-            else:
-                return f"{num:,}"
+        return render_template('jobs/pending.html',
+                             title='Analizando actividad',
+                             icon='📊',
+                             message='Estamos revisando los comentarios del video para estimar su actividad reciente.',
+                             status_url=url_for('jobs.job_status', job_id=job_id),
+                             result_url=url_for('video_activity.report_result', video_id=video_id, job_id=job_id))
+    except Exception as e:
+        return render_template('video_activity/error.html',
+                             error=str(e),
+                             video_id=video_id)
+
+@video_activity_bp.route('/report/<video_id>/result/<job_id>')
+def report_result(video_id, job_id):
+    try:
+        job = jobs.get_job(job_id)
+        
+        if not job:
+            raise Exception("El análisis no existe o ha caducado. Vuelve a generarlo.")
+        
+        if job['status'] in ('queued', 'running'):
+            return redirect(url_for('video_activity.generate_report', video_id=video_id))
+        
+        if job['status'] == 'failed':
+            raise Exception(job['error'])
         
         return render_template('video_activity/report.html',
-                             result=result,
+                             result=job['result'],
                              format_number=format_number)
     except Exception as e:
         return render_template('video_activity/error.html',
                              error=str(e),
-                             video_id=video_id)
\ No newline at end of file
+                             video_id=video_id)
+
+# Función helper para formatear números
+def format_number(num):
+    if num >= 1000000:
+        return f"{num/1000000:.1f}M"
+    elif num >= 1000:
+        return f"{num/1000:.0f}K"
+    else:
+        return f"{num:,}"
\ No newline at end of file
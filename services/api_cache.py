@@ -0,0 +1,78 @@
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+from googleapiclient.http import HttpRequest
+
+from config import API_CACHE_ENABLED, API_CACHE_MAX_BYTES
+from services.cache_store import TTLCache
+from services.quota import record_usage
+
+# Tiempo de vida (segundos) de las respuestas de cada endpoint de YouTube Data API.
+# Los endpoints que no aparecen aquí (p. ej. captions.download) nunca se cachean.
+API_CACHE_TTLS = {
+    'youtube.search.list': 15 * 60,
+    'youtube.commentThreads.list': 10 * 60,
+    'youtube.videos.list': 60 * 60,
+    'youtube.captions.list': 24 * 3600,
+    'youtube.channels.list': 24 * 3600,
+    'youtube.videoCategories.list': 7 * 24 * 3600,
+}
+
+_cache = TTLCache('youtube_api', default_ttl=15 * 60, max_bytes=API_CACHE_MAX_BYTES)
+_stats_lock = threading.Lock()
+_endpoint_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+def cache_key(method_id, uri):
+    """Clave de caché: endpoint + parámetros ordenados, sin la API key"""
+    parsed = urlparse(uri)
+    params = sorted((name, value) for name, value in parse_qsl(parsed.query) if name != 'key')
+    return f"{method_id}:{parsed.path}?{urlencode(params)}"
+
+def _count(method_id, hit):
+    with _stats_lock:
+        _endpoint_stats[method_id]['hits' if hit else 'misses'] += 1
+
+def get_cache_stats():
+    """Contadores de aciertos y fallos de este proceso, en total y por endpoint"""
+    with _stats_lock:
+        endpoints = {method_id: dict(counts) for method_id, counts in _endpoint_stats.items()}
+    return {
+        'enabled': API_CACHE_ENABLED,
+        **_cache.stats(),
+        'endpoints': endpoints
+    }
+
+class CachedHttpRequest(HttpRequest):
+    """
+    HttpRequest que consulta la caché persistente antes de ir a la red.
+
+    Se pasa como requestBuilder al construir el cliente, de modo que todas las
+    llamadas .execute() de los servicios se cachean sin cambiar su código. Solo se
+    guardan respuestas correctas de peticiones GET de los endpoints de API_CACHE_TTLS.
+    Las llamadas que sí llegan a la red se registran en services.quota.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        ttl = API_CACHE_TTLS.get(self.methodId)
+        cacheable = API_CACHE_ENABLED and ttl and self.method == 'GET'
+
+        if cacheable:
+            key = cache_key(self.methodId, self.uri)
+            response = _cache.get(key)
+            if response is not None:
+                _count(self.methodId, True)
+                logging.debug(f"Caché API (acierto): {key}")
+                return response
+            _count(self.methodId, False)
+
+        # Solo las llamadas que llegan a la red consumen cuota
+        try:
+            response = super().execute(http=http, num_retries=num_retries)
+        finally:
+            record_usage(self.methodId)
+
+        if cacheable:
+            _cache.set(key, response, ttl)
+        return response
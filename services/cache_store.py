@@ -0,0 +1,209 @@
+import os
+import json
+import stat
+import time
+import zlib
+import pickle
+import sqlite3
+import logging
+import threading
+
+from config import CACHE_DIR, CACHE_DB_NAME
+
+_local = threading.local()
+_checked_dir = None
+
+def _check_cache_dir():
+    """
+    Crea CACHE_DIR como directorio privado (0700) y comprueba que pertenece al
+    usuario del proceso y que nadie más puede escribir en él. Las bases guardan
+    valores serializados con pickle (trabajos, resultados compartidos): un
+    directorio ajeno en /tmp permitiría a otro usuario local colocar una base que
+    ejecute código al leerla.
+    """
+    global _checked_dir
+    if _checked_dir == CACHE_DIR:
+        return
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    info = os.lstat(CACHE_DIR)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{CACHE_DIR} no es un directorio")
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{CACHE_DIR} pertenece a otro usuario (uid {info.st_uid})")
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"Otros usuarios pueden escribir en {CACHE_DIR}; usa un directorio privado")
+        if stat.S_IMODE(info.st_mode) != 0o700:
+            os.chmod(CACHE_DIR, 0o700)
+    _checked_dir = CACHE_DIR
+
+def get_connection(db_name=CACHE_DB_NAME):
+    """
+    Devuelve la conexión SQLite del hilo actual para una base de datos de CACHE_DIR.
+
+    Las bases se abren en modo WAL para que todos los workers de gunicorn puedan
+    leer mientras otro escribe. Las conexiones no se comparten entre hilos ni
+    sobreviven a un fork. CACHE_DIR se verifica antes de abrir la primera.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    connection = connections.get(db_name)
+    if connection is None:
+        _check_cache_dir()
+        connection = sqlite3.connect(os.path.join(CACHE_DIR, db_name), timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connections[db_name] = connection
+    return connection
+
+def serialize(value):
+    """Serializa un valor de forma compacta (pickle + zlib)"""
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+def deserialize(data):
+    return pickle.loads(zlib.decompress(data))
+
+def serialize_json(value):
+    """Serializa un valor JSON (respuestas de la API, textos) de forma compacta (JSON + zlib)"""
+    return zlib.compress(json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+def deserialize_json(data):
+    return json.loads(zlib.decompress(data))
+
+class TTLCache:
+    """
+    Caché clave-valor con caducidad, persistente y compartida entre workers.
+
+    Cada instancia usa su propio namespace dentro de la tabla cache_entries. Los
+    valores se guardan como JSON; solo los namespaces con pickle_values=True (con
+    valores que JSON no representa, como fechas) usan pickle. Si se indica max_bytes, al superarse se eliminan primero las entradas caducadas y
+    después las que caducan antes. Los errores de SQLite se registran y se tratan
+    como fallos de caché: la caché nunca debe romper una petición.
+    """
+
+    # Cada cuántas escrituras se comprueba el tamaño del namespace
+    EVICTION_CHECK_INTERVAL = 50
+
+    def __init__(self, namespace, default_ttl, max_bytes=None, db_name=CACHE_DB_NAME, pickle_values=False):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.db_name = db_name
+        self._serialize = serialize if pickle_values else serialize_json
+        self._deserialize = deserialize if pickle_values else deserialize_json
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._initialized_pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        connection = get_connection(self.db_name)
+        if self._initialized_pid != os.getpid():
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    value BLOB NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            """)
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (namespace, expires_at)'
+            )
+            self._initialized_pid = os.getpid()
+        return connection
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        try:
+            row = self._connection().execute(
+                'SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?',
+                (self.namespace, key, time.time())
+            ).fetchone()
+            if row:
+                value = self._deserialize(row[0])
+                self._count(True)
+                return value
+        except Exception as e:
+            logging.warning(f"Error leyendo la caché {self.namespace}: {e}")
+        self._count(False)
+        return default
+
+    def set(self, key, value, ttl=None):
+        try:
+            data = self._serialize(value)
+            expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, expires_at, size, value) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, expires_at, len(data), data)
+            )
+            with self._lock:
+                self._writes += 1
+                check_size = self._writes % self.EVICTION_CHECK_INTERVAL == 0
+            if check_size:
+                self.evict()
+        except Exception as e:
+            logging.warning(f"Error escribiendo en la caché {self.namespace}: {e}")
+
+    def delete(self, key):
+        try:
+            self._connection().execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            )
+        except Exception as e:
+            logging.warning(f"Error borrando de la caché {self.namespace}: {e}")
+
+    def evict(self):
+        """Elimina las entradas caducadas y, si hace falta, las más próximas a caducar"""
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?',
+            (self.namespace, time.time())
+        )
+        if not self.max_bytes:
+            return
+
+        total_size = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?',
+            (self.namespace,)
+        ).fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        # Liberar hasta quedar en el 90% del límite para no desalojar en cada escritura
+        to_free = total_size - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in connection.execute(
+            'SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY expires_at',
+            (self.namespace,)
+        ):
+            keys.append((self.namespace, key))
+            freed += size
+            if freed >= to_free:
+                break
+        connection.executemany('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', keys)
+        logging.info(f"Caché {self.namespace}: desalojadas {len(keys)} entradas ({freed} bytes)")
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0
+        }
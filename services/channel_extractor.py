@@ -1,9 +1,17 @@
-import os
 import re
+import codecs
 import requests
 from urllib.parse import urlparse, parse_qs
 import logging
 import json
+from config import CHANNEL_RESOLUTION_TTL, CHANNEL_RESOLUTION_NEGATIVE_TTL
+from services.youtube_api import get_youtube_client
+from services.cache_store import TTLCache
+from services.http_sessions import get_session
+
+# Caché persistente (compartida entre workers) de resoluciones URL -> channel ID
+_cache_resoluciones = TTLCache('channel_resolution', default_ttl=CHANNEL_RESOLUTION_TTL)
+_SIN_RESOLVER = object()
 
 def obtener_id_canal(url):
     """
@@ -42,6 +50,47 @@ def obtener_id_canal(url):
             logging.info(f"ID de canal encontrado en la URL: {channel_id}")
             return channel_id
     
+    # El resto de casos requieren peticiones: consultar antes la caché de resoluciones
+    clave = clave_de_resolucion(parsed_url, path_parts)
+    channel_id = _cache_resoluciones.get(clave, _SIN_RESOLVER)
+    if channel_id is not _SIN_RESOLVER:
+        logging.info(f"Resolución en caché para {clave}: {channel_id or 'sin resultado'}")
+        return channel_id or None
+    
+    channel_id = resolver_id_canal(url, parsed_url, path_parts)
+    
+    # Los fallos se recuerdan poco tiempo para no repetir descargas lentas de URLs erróneas
+    _cache_resoluciones.set(
+        clave,
+        channel_id or '',
+        CHANNEL_RESOLUTION_TTL if channel_id else CHANNEL_RESOLUTION_NEGATIVE_TTL
+    )
+    return channel_id
+
+def clave_de_resolucion(parsed_url, path_parts):
+    """Clave normalizada (handle, nombre personalizado, video o URL) de una resolución"""
+    netloc = parsed_url.netloc.lower()
+    
+    if 'youtu.be' in netloc and path_parts:
+        return f"video:{path_parts[0]}"
+    if 'watch' in path_parts and parsed_url.query:
+        video_id = parse_qs(parsed_url.query).get('v', [None])[0]
+        if video_id:
+            return f"video:{video_id}"
+    if path_parts:
+        # Los handles y nombres personalizados de YouTube no distinguen mayúsculas
+        if path_parts[0].startswith('@'):
+            return f"handle:{path_parts[0].lower()}"
+        if len(path_parts) >= 2 and path_parts[0] in ['c', 'user']:
+            return f"{path_parts[0]}:{path_parts[1].lower()}"
+        if len(path_parts) == 1:
+            return f"name:{path_parts[0].lower()}"
+    
+    netloc = netloc.removeprefix('www.').removeprefix('m.')
+    return f"url:{netloc}/{'/'.join(path_parts)}?{parsed_url.query}"
+
+def resolver_id_canal(url, parsed_url, path_parts):
+    """Resuelve el ID del canal de las URLs que no lo contienen directamente"""
     # Caso 2: URLs cortas de youtu.be (youtu.be/video_id)
     if 'youtu.be' in parsed_url.netloc and path_parts:
         video_id = path_parts[0].split('?')[0]  # Remover parámetros de query
@@ -76,19 +125,18 @@ def obtener_id_canal(url):
     logging.info("Intentando obtener ID del contenido de la página")
     return obtener_id_desde_contenido_pagina(url)
 
+_CHANNEL_ID_VALIDO = re.compile(r'UC[a-zA-Z0-9_-]{22}')
+
 def es_channel_id_valido(channel_id):
     """Verifica si un string tiene el formato de un channel ID válido"""
-    return bool(re.match(r'^UC[a-zA-Z0-9_-]{22}$', channel_id))
+    return bool(_CHANNEL_ID_VALIDO.fullmatch(channel_id))
 
 def obtener_id_desde_video(video_id):
     """Obtiene el channel ID desde un video ID usando la API de YouTube"""
-    api_key = os.environ.get('YOUTUBE_API_KEY')
+    youtube = get_youtube_client()
     
-    if api_key:
+    if youtube:
         try:
-            from googleapiclient.discovery import build
-            youtube = build('youtube', 'v3', developerKey=api_key)
-            
             request = youtube.videos().list(
                 part='snippet',
                 id=video_id
@@ -122,59 +170,24 @@ def obtener_id_desde_contenido_pagina(url):
         }
         
         logging.info(f"Solicitando contenido de: {url}")
-        respuesta = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        respuesta.raise_for_status()
-        
-        contenido = respuesta.text
-        logging.debug(f"Contenido obtenido, longitud: {len(contenido)}")
-        
-        # Lista de patrones ordenados por probabilidad de éxito
-        patrones = [
-            # Patrón más común en el JSON de la página
-            r'"channelId":"(UC[a-zA-Z0-9_-]{22})"',
-            # En metadatos
-            r'<meta property="og:url" content="https://www\.youtube\.com/channel/(UC[a-zA-Z0-9_-]{22})"',
-            # En enlaces canónicos
-            r'<link rel="canonical" href="https://www\.youtube\.com/channel/(UC[a-zA-Z0-9_-]{22})"',
-            # En browse endpoints
-            r'"browseEndpoint":{"browseId":"(UC[a-zA-Z0-9_-]{22})"',
-            # En datos estructurados
-            r'"externalId":"(UC[a-zA-Z0-9_-]{22})"',
-            # En URLs de suscripción
-            r'channel/(UC[a-zA-Z0-9_-]{22})',
-            # En configuración del cliente
-            r'"CHANNEL_ID":"(UC[a-zA-Z0-9_-]{22})"',
-            # En metadatos adicionales
-            r'"channelMetadataRenderer":{"title":"[^"]*","description":"[^"]*","rssUrl":"[^"]*","externalId":"(UC[a-zA-Z0-9_-]{22})"',
-        ]
+        respuesta = get_session('youtube_web').get(url, headers=headers, timeout=15, allow_redirects=True, stream=True)
+        try:
+            respuesta.raise_for_status()
+            channel_id, contenido = escanear_pagina(respuesta)
+        finally:
+            # Cierra la conexión aunque quede parte de la página sin descargar
+            respuesta.close()
         
-        for i, patron in enumerate(patrones):
-            try:
-                coincidencias = re.findall(patron, contenido)
-                if coincidencias:
-                    # Tomar la primera coincidencia válida
-                    for coincidencia in coincidencias:
-                        channel_id = coincidencia if isinstance(coincidencia, str) else coincidencia[0]
-                        if es_channel_id_valido(channel_id):
-                            logging.info(f"Channel ID encontrado con patrón {i+1}: {channel_id}")
-                            return channel_id
-            except Exception as e:
-                logging.warning(f"Error con patrón {i+1}: {e}")
-                continue
+        if channel_id:
+            return channel_id
         
         # Búsqueda adicional en JSON embebido
         try:
-            # Buscar bloques de JSON en el HTML
-            json_matches = re.findall(r'var ytInitialData = ({.*?});', contenido)
-            for json_str in json_matches:
-                try:
-                    data = json.loads(json_str)
-                    channel_id = extraer_channel_id_de_json(data)
-                    if channel_id:
-                        logging.info(f"Channel ID encontrado en ytInitialData: {channel_id}")
-                        return channel_id
-                except:
-                    continue
+            for data in extraer_yt_initial_data(contenido):
+                channel_id = extraer_channel_id_de_json(data)
+                if channel_id:
+                    logging.info(f"Channel ID encontrado en ytInitialData: {channel_id}")
+                    return channel_id
         except Exception as e:
             logging.warning(f"Error procesando JSON embebido: {e}")
         
@@ -188,42 +201,147 @@ def obtener_id_desde_contenido_pagina(url):
         logging.error(f"Error inesperado procesando página: {e}")
         return None
 
-def extraer_channel_id_de_json(data, visited=None):
-    """Extrae recursivamente el channel ID de estructuras JSON complejas"""
-    if visited is None:
-        visited = set()
+# Contextos en los que aparece el channel ID, ordenados por prioridad (probabilidad
+# de éxito): (texto inmediatamente anterior al ID, texto inmediatamente posterior)
+CONTEXTOS_CHANNEL_ID = [
+    # Patrón más común en el JSON de la página
+    ('"channelId":"', '"'),
+    # En metadatos
+    ('<meta property="og:url" content="https://www.youtube.com/channel/', '"'),
+    # En enlaces canónicos
+    ('<link rel="canonical" href="https://www.youtube.com/channel/', '"'),
+    # En browse endpoints
+    ('"browseEndpoint":{"browseId":"', '"'),
+    # En datos estructurados (incluye el externalId de channelMetadataRenderer)
+    ('"externalId":"', '"'),
+    # En URLs de suscripción
+    ('channel/', ''),
+    # En configuración del cliente
+    ('"CHANNEL_ID":"', '"'),
+]
+
+# Se buscan los IDs y no los contextos: el prefijo literal "UC" permite al motor de
+# expresiones regulares saltar por el texto, y cada candidato se clasifica mirando
+# el texto que lo rodea. Así la página se recorre una sola vez para todos los contextos.
+_CANDIDATO_CHANNEL_ID = re.compile(r'UC[a-zA-Z0-9_-]{22}')
+
+def buscar_channel_id(texto, limite=len(CONTEXTOS_CHANNEL_ID)):
+    """
+    Recorre el texto una vez y devuelve (prioridad, channel_id) de la coincidencia de
+    mayor prioridad (la primera en el texto si hay empate), o None. Solo se tienen en
+    cuenta los contextos con prioridad menor que `limite`.
+    """
+    mejor = None
+    for candidato in _CANDIDATO_CHANNEL_ID.finditer(texto):
+        inicio, fin = candidato.span()
+        for prioridad in range(mejor[0] if mejor else limite):
+            antes, despues = CONTEXTOS_CHANNEL_ID[prioridad]
+            if texto.endswith(antes, 0, inicio) and texto.startswith(despues, fin):
+                mejor = (prioridad, candidato.group())
+                if prioridad == 0:
+                    return mejor
+                break
+    return mejor
+
+# Los tres primeros contextos identifican el canal de la propia página: en cuanto
+# aparece uno se deja de descargar. Con los demás se sigue leyendo por si aparece
+# más adelante uno de mayor prioridad.
+PRIORIDAD_DEFINITIVA = 3
+
+# Tamaño de cada bloque leído y texto que se conserva entre bloques para
+# encontrar coincidencias partidas entre dos bloques
+TAMANO_BLOQUE = 64 * 1024
+SOLAPAMIENTO = 8 * 1024
+
+def escanear_pagina(respuesta):
+    """
+    Lee la respuesta por bloques buscando el channel ID y se detiene en cuanto
+    encuentra uno definitivo.
+
+    Devuelve (channel_id, None) si lo encuentra, o (None, contenido) con la página
+    completa para las búsquedas adicionales si no hay ninguna coincidencia.
+    """
+    decodificador = codecs.getincrementaldecoder(respuesta.encoding or 'utf-8')(errors='replace')
+    partes = []
+    cola = ''
+    mejor = None  # (prioridad, channel_id)
+    leido = 0
     
-    # Evitar bucles infinitos
-    if id(data) in visited:
-        return None
-    visited.add(id(data))
+    for bloque in respuesta.iter_content(chunk_size=TAMANO_BLOQUE):
+        leido += len(bloque)
+        texto = decodificador.decode(bloque)
+        ventana = cola + texto
+        
+        # Solo interesan contextos de mayor prioridad que el mejor encontrado
+        encontrado = buscar_channel_id(ventana, mejor[0] if mejor else len(CONTEXTOS_CHANNEL_ID))
+        if encontrado:
+            mejor = encontrado
+        
+        if mejor and mejor[0] < PRIORIDAD_DEFINITIVA:
+            logging.info(f"Channel ID encontrado con patrón {mejor[0]+1} tras leer {leido} bytes: {mejor[1]}")
+            return mejor[1], None
+        
+        if not mejor:
+            partes.append(texto)
+        cola = ventana[-SOLAPAMIENTO:]
     
-    try:
-        if isinstance(data, dict):
-            # Buscar directamente channelId
-            if 'channelId' in data:
-                channel_id = data['channelId']
-                if isinstance(channel_id, str) and es_channel_id_valido(channel_id):
-                    return channel_id
-            
-            # Buscar en browseId
-            if 'browseId' in data:
-                browse_id = data['browseId']
-                if isinstance(browse_id, str) and es_channel_id_valido(browse_id):
-                    return browse_id
+    if mejor:
+        logging.info(f"Channel ID encontrado con patrón {mejor[0]+1}: {mejor[1]}")
+        return mejor[1], None
+    
+    partes.append(decodificador.decode(b'', final=True))
+    contenido = ''.join(partes)
+    logging.debug(f"Contenido obtenido, longitud: {len(contenido)}")
+    return None, contenido
+
+# Inicio del objeto ytInitialData en el HTML (var ytInitialData = {...} o
+# window["ytInitialData"] = {...})
+_INICIO_YT_INITIAL_DATA = re.compile(r'(?:var ytInitialData|window\["ytInitialData"\])\s*=\s*(?=\{)')
+_DECODIFICADOR_JSON = json.JSONDecoder()
+
+# Profundidad máxima a la que se buscan channelId/browseId dentro de ytInitialData
+PROFUNDIDAD_MAXIMA_JSON = 64
+
+def extraer_yt_initial_data(contenido):
+    """
+    Genera los objetos ytInitialData de la página. Cada uno se decodifica desde su
+    inicio con raw_decode, que se detiene al cerrar el objeto, sin copiar ni
+    analizar el resto del HTML.
+    """
+    for inicio in _INICIO_YT_INITIAL_DATA.finditer(contenido):
+        try:
+            data, _ = _DECODIFICADOR_JSON.raw_decode(contenido, inicio.end())
+        except ValueError as e:
+            logging.debug(f"ytInitialData no válido en la posición {inicio.end()}: {e}")
+            continue
+        yield data
+
+def extraer_channel_id_de_json(data, profundidad_maxima=PROFUNDIDAD_MAXIMA_JSON):
+    """
+    Busca el primer channelId (o browseId) con formato de channel ID en una
+    estructura JSON, en el mismo orden que un recorrido en profundidad y sin
+    bajar de `profundidad_maxima` niveles
+    """
+    # Pila de iteradores: uno por nivel abierto, así el recorrido no depende del
+    # límite de recursión y no hay que copiar los hijos de cada nodo
+    pila = [iter((data,))]
+    while pila:
+        for nodo in pila[-1]:
+            if isinstance(nodo, dict):
+                for clave in ('channelId', 'browseId'):
+                    valor = nodo.get(clave)
+                    if isinstance(valor, str) and es_channel_id_valido(valor):
+                        return valor
+                hijos = nodo.values()
+            elif isinstance(nodo, list):
+                hijos = nodo
+            else:
+                continue
             
-            # Buscar recursivamente en todos los valores
-            for value in data.values():
-                result = extraer_channel_id_de_json(value, visited)
-                if result:
-                    return result
-                    
-        elif isinstance(data, list):
-            for item in data:
-                result = extraer_channel_id_de_json(item, visited)
-                if result:
-                    return result
-    except:
-        pass
-    
-    return None
\ No newline at end of file
+            if len(pila) <= profundidad_maxima:
+                pila.append(iter(hijos))
+                break
+        else:
+            pila.pop()
+    
+    return None
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+from array import array
+
+from services.cache_store import get_connection
+
+COMMENT_TIMELINE_DB_NAME = 'comment_timeline.sqlite3'
+
+_table_ready_pid = None
+
+def _connection():
+    """
+    Línea temporal de comentarios de cada video analizado: las fechas de todos
+    sus comentarios y respuestas (array de segundos epoch ordenado, guardado como
+    bytes), desde qué fecha está completa, si la última descarga completa se
+    cortó por el límite de resultados y la marca de agua (fecha del hilo más
+    reciente ya descargado y los IDs de los hilos de ese mismo segundo).
+    """
+    global _table_ready_pid
+    connection = get_connection(COMMENT_TIMELINE_DB_NAME)
+    if _table_ready_pid != os.getpid():
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS comment_timelines (
+                video_id TEXT PRIMARY KEY,
+                covered_since INTEGER NOT NULL,
+                watermark INTEGER,
+                watermark_ids TEXT NOT NULL,
+                times BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                capped INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(comment_timelines)')}
+        if 'capped' not in columns:
+            # Bases creadas antes de existir la columna (otro worker puede añadirla a la vez)
+            try:
+                connection.execute('ALTER TABLE comment_timelines ADD COLUMN capped INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError as e:
+                if 'duplicate column' not in str(e):
+                    raise
+        _table_ready_pid = os.getpid()
+    return connection
+
+def _load(connection, video_id):
+    row = connection.execute(
+        'SELECT covered_since, capped, watermark, watermark_ids, times FROM comment_timelines WHERE video_id = ?',
+        (video_id,)
+    ).fetchone()
+    if not row:
+        return None
+
+    covered_since, capped, watermark, watermark_ids, data = row
+    times = array('q')
+    times.frombytes(data)
+    return {
+        'covered_since': covered_since,
+        'capped': bool(capped),
+        'watermark': watermark,
+        'watermark_ids': set(json.loads(watermark_ids)),
+        'times': times
+    }
+
+def _watermark(threads, watermark=None, watermark_ids=()):
+    """Marca de agua tras añadir `threads` [(thread_id, thread_time, reply_times), ...]"""
+    newest = max((thread_time for _, thread_time, _ in threads), default=watermark)
+    if newest is None:
+        return None, set()
+    ids = {thread_id for thread_id, thread_time, _ in threads if thread_time == newest}
+    if newest == watermark:
+        ids |= set(watermark_ids)
+    return newest, ids
+
+def _save(connection, video_id, times, covered_since, capped, watermark, watermark_ids):
+    connection.execute(
+        """INSERT OR REPLACE INTO comment_timelines
+           (video_id, covered_since, capped, watermark, watermark_ids, times, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (video_id, covered_since, int(capped), watermark, json.dumps(sorted(watermark_ids)),
+         times.tobytes(), time.time())
+    )
+
+def _thread_times(threads):
+    times = []
+    for _, thread_time, reply_times in threads:
+        times.append(thread_time)
+        times.extend(reply_times)
+    return times
+
+def get_timeline(video_id):
+    """
+    Returns:
+        dict: {'covered_since', 'capped', 'watermark', 'watermark_ids', 'times'} o
+              None si el video no se ha analizado nunca
+    """
+    return _load(_connection(), video_id)
+
+def replace_timeline(video_id, threads, covered_since, capped=False):
+    """
+    Sustituye la línea temporal del video por los hilos de una descarga completa
+    (threads: [(thread_id, thread_time, reply_times), ...]), que cubre todos los
+    comentarios desde `covered_since`. `capped` indica que la descarga se cortó
+    por el límite de resultados. Devuelve el array ordenado de fechas.
+    """
+    times = array('q', sorted(_thread_times(threads)))
+    watermark, watermark_ids = _watermark(threads)
+    _save(_connection(), video_id, times, covered_since, capped, watermark, watermark_ids)
+    return times
+
+def merge_threads(video_id, threads):
+    """
+    Añade a la línea temporal los hilos posteriores a su marca de agua y la
+    avanza. Los hilos que ya estaban (por ejemplo, si otra petición los añadió
+    mientras tanto) se descartan. Devuelve el array ordenado de fechas.
+    """
+    connection = _connection()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        timeline = _load(connection, video_id)
+        watermark, watermark_ids = timeline['watermark'], timeline['watermark_ids']
+        if watermark is not None:
+            threads = [
+                thread for thread in threads
+                if thread[1] > watermark or (thread[1] == watermark and thread[0] not in watermark_ids)
+            ]
+
+        times = timeline['times']
+        if threads:
+            times = array('q', sorted(times.tolist() + _thread_times(threads)))
+            watermark, watermark_ids = _watermark(threads, watermark, watermark_ids)
+        _save(connection, video_id, times, timeline['covered_since'], timeline['capped'], watermark, watermark_ids)
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return times
@@ -0,0 +1,81 @@
+import os
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+
+_lock = threading.Lock()
+_local = threading.local()
+_adapter = None
+_adapter_pid = None
+
+def _get_adapter():
+    """Adaptador (y por tanto pools de conexiones) compartido por todo el proceso"""
+    global _adapter, _adapter_pid
+    with _lock:
+        if _adapter is None or _adapter_pid != os.getpid():
+            _adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            _adapter_pid = os.getpid()
+        return _adapter
+
+def get_session(name='default'):
+    """
+    Devuelve la sesión HTTP `name` del hilo actual para peticiones fuera de YouTube
+    Data API (páginas de YouTube, sugerencias de búsqueda...).
+
+    Cada hilo tiene sus propias sesiones (cookies y cabeceras no se mezclan entre
+    peticiones concurrentes), pero todas montan el mismo adaptador, que mantiene
+    un pool de conexiones keep-alive por host para el proceso. Las peticiones
+    repetidas al mismo host reutilizan la conexión y se ahorran el handshake TCP y TLS.
+    Las sesiones con nombres distintos no comparten cookies.
+    """
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.sessions = {}
+        _local.pid = os.getpid()
+
+    session = _local.sessions.get(name)
+    if session is None:
+        adapter = _get_adapter()
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.sessions[name] = session
+        logging.debug(f"Sesión HTTP '{name}' creada para el hilo {threading.current_thread().name}")
+    return session
+
+def get_http_stats():
+    """
+    Peticiones y conexiones abiertas por host en los pools de este proceso. Una
+    petición que no abre conexión nueva ha reutilizado una existente.
+    """
+    with _lock:
+        adapter = _adapter if _adapter_pid == os.getpid() else None
+
+    hosts = {}
+    if adapter is not None:
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            entry = hosts.setdefault(f"{pool.scheme}://{pool.host}", {'requests': 0, 'connections': 0})
+            entry['requests'] += pool.num_requests
+            entry['connections'] += pool.num_connections
+
+    for entry in hosts.values():
+        entry['reused'] = max(entry['requests'] - entry['connections'], 0)
+
+    total_requests = sum(entry['requests'] for entry in hosts.values())
+    total_reused = sum(entry['reused'] for entry in hosts.values())
+    return {
+        'pool_connections': HTTP_POOL_CONNECTIONS,
+        'pool_maxsize': HTTP_POOL_MAXSIZE,
+        'requests': total_requests,
+        'connections': sum(entry['connections'] for entry in hosts.values()),
+        'reused': total_reused,
+        'reuse_ratio': round(total_reused / total_requests, 3) if total_requests else None,
+        'hosts': hosts
+    }
@@ -0,0 +1,253 @@
+import os
+import sys
+import time
+import uuid
+import signal
+import sqlite3
+import logging
+import importlib
+import subprocess
+
+from config import JOB_LEASE_SECONDS, JOB_RESULT_TTL, JOB_POLL_INTERVAL, JOB_SUPERVISE_INTERVAL
+from services.cache_store import get_connection, serialize, deserialize
+from services import quota
+
+JOBS_DB_NAME = 'jobs.sqlite3'
+
+# Trabajos que pueden ejecutarse en segundo plano: tipo -> (función, funcionalidad para la cuota)
+JOB_HANDLERS = {
+    'analyze_video_structure': ('services.video_analyzer:analyze_video_structure', 'seo'),
+    'analyze_video_activity': ('services.video_activity:analyze_video_activity', 'video_activity'),
+}
+
+_table_ready_pid = None
+
+def _connection():
+    global _table_ready_pid
+    connection = get_connection(JOBS_DB_NAME)
+    if _table_ready_pid != os.getpid():
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                args_key TEXT NOT NULL,
+                args BLOB NOT NULL,
+                status TEXT NOT NULL,
+                result BLOB,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_expires REAL
+            )
+        """)
+        connection.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+        connection.execute('CREATE INDEX IF NOT EXISTS idx_jobs_args ON jobs (kind, args_key)')
+        # Como mucho un trabajo idéntico pendiente o en curso: submit se apoya en
+        # este índice para no encolar dos veces con peticiones simultáneas
+        try:
+            connection.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs (kind, args_key)
+                WHERE status IN ('queued', 'running')
+            """)
+        except sqlite3.IntegrityError as e:
+            logging.warning(f"No se pudo crear el índice de trabajos activos (hay duplicados): {e}")
+        _table_ready_pid = os.getpid()
+    return connection
+
+def submit(kind, *args, **kwargs):
+    """
+    Encola un trabajo y devuelve su ID sin esperar a que se ejecute. Si ya hay un
+    trabajo idéntico pendiente o en curso, se devuelve el ID de ese trabajo.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+
+    args_key = repr((args, sorted(kwargs.items())))
+    args_data = serialize((args, kwargs))
+    connection = _connection()
+    for _ in range(3):
+        job_id = uuid.uuid4().hex
+        cursor = connection.execute(
+            """INSERT INTO jobs (id, kind, args_key, args, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)
+               ON CONFLICT DO NOTHING""",
+            (job_id, kind, args_key, args_data, time.time())
+        )
+        if cursor.rowcount == 1:
+            logging.info(f"Trabajo {kind} encolado: {job_id}")
+            return job_id
+        
+        # Ya hay un trabajo idéntico activo; si acaba de terminar, se vuelve a intentar
+        row = connection.execute(
+            "SELECT id FROM jobs WHERE kind = ? AND args_key = ? AND status IN ('queued', 'running')",
+            (kind, args_key)
+        ).fetchone()
+        if row:
+            return row[0]
+    raise RuntimeError(f"No se pudo encolar el trabajo {kind}")
+
+def get_job(job_id):
+    """Devuelve el estado de un trabajo (con su resultado si ha terminado) o None si no existe"""
+    row = _connection().execute(
+        'SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?',
+        (job_id,)
+    ).fetchone()
+    if not row:
+        return None
+
+    job_id, kind, status, result, error, created_at, started_at, finished_at = row
+    return {
+        'id': job_id,
+        'kind': kind,
+        'status': status,
+        'result': deserialize(result) if result is not None else None,
+        'error': error,
+        'created_at': created_at,
+        'started_at': started_at,
+        'finished_at': finished_at
+    }
+
+def claim_next_job():
+    """
+    Reserva el siguiente trabajo pendiente de forma atómica. Los trabajos cuyo
+    proceso murió sin terminarlos (lease caducado) vuelven a ejecutarse.
+    """
+    now = time.time()
+    row = _connection().execute("""
+        UPDATE jobs SET status = 'running', started_at = ?, lease_expires = ?, attempts = attempts + 1
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE status = 'queued' OR (status = 'running' AND lease_expires <= ?)
+            ORDER BY created_at LIMIT 1
+        )
+        RETURNING id, kind, args, attempts
+    """, (now, now + JOB_LEASE_SECONDS, now)).fetchone()
+    return row
+
+def _finish(job_id, status, result=None, error=None):
+    _connection().execute(
+        'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires = NULL WHERE id = ?',
+        (status, serialize(result) if result is not None else None, error, time.time(), job_id)
+    )
+
+def purge_expired_jobs():
+    _connection().execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at <= ?",
+        (time.time() - JOB_RESULT_TTL,)
+    )
+
+def _resolve_handler(kind):
+    target, feature = JOB_HANDLERS[kind]
+    module_name, function_name = target.split(':')
+    return getattr(importlib.import_module(module_name), function_name), feature
+
+def run_job(job_id, kind, args):
+    handler, feature = _resolve_handler(kind)
+    args, kwargs = deserialize(args)
+    logging.info(f"Ejecutando trabajo {kind} {job_id}")
+    quota.start_request(feature)
+    try:
+        result = handler(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"Trabajo {job_id} fallido: {e}")
+        _finish(job_id, 'failed', error=str(e))
+    else:
+        _finish(job_id, 'done', result=result)
+    finally:
+        quota.end_request()
+
+def run_worker(max_attempts=3):
+    """Bucle de un proceso worker: ejecuta trabajos hasta recibir SIGTERM"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    logging.info(f"Worker de trabajos iniciado (pid {os.getpid()})")
+
+    last_purge = 0
+    while not stopping:
+        try:
+            if time.time() - last_purge > 3600:
+                purge_expired_jobs()
+                last_purge = time.time()
+
+            job = claim_next_job()
+            if not job:
+                time.sleep(JOB_POLL_INTERVAL)
+                continue
+
+            job_id, kind, args, attempts = job
+            if attempts > max_attempts:
+                _finish(job_id, 'failed', error='El trabajo se interrumpió demasiadas veces')
+                continue
+            run_job(job_id, kind, args)
+        except Exception as e:
+            logging.error(f"Error en el worker de trabajos: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+
+def _spawn_worker():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen([sys.executable, os.path.join(root, 'worker.py')], cwd=root)
+
+def _stop_processes(processes, timeout=10):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def run_supervisor(count):
+    """
+    Bucle del proceso supervisor (python worker.py --processes N): lanza `count`
+    workers y cada JOB_SUPERVISE_INTERVAL segundos relanza los que hayan terminado
+    (por un fallo, por el OOM killer...), de modo que la cola no se queda sin
+    consumidores mientras la aplicación sigue aceptando trabajos. Los workers son
+    hijos de este proceso y solo él los recoge con waitpid: si se supervisaran
+    desde el árbitro de gunicorn, su reap_workers (waitpid(-1)) recogería también
+    sus códigos de salida y Popen.poll() vería ECHILD.
+
+    Con SIGTERM o SIGINT, o si el proceso que lo lanzó desaparece, termina los
+    workers y sale con código 0.
+    """
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stopping.append(signum))
+    parent_pid = os.getppid()
+
+    processes = [_spawn_worker() for _ in range(count)]
+    logging.info(f"Supervisor de trabajos iniciado (pid {os.getpid()}, {count} workers)")
+    try:
+        last_check = time.time()
+        while not stopping and os.getppid() == parent_pid:
+            time.sleep(JOB_POLL_INTERVAL)
+            if time.time() - last_check < JOB_SUPERVISE_INTERVAL:
+                continue
+            last_check = time.time()
+
+            for index, process in enumerate(processes):
+                returncode = process.poll()
+                if returncode is None or stopping:
+                    continue
+                processes[index] = _spawn_worker()
+                logging.warning(
+                    f"El worker de trabajos {process.pid} terminó (código {returncode}); "
+                    f"relanzado como {processes[index].pid}"
+                )
+    finally:
+        _stop_processes(processes)
+    logging.info("Supervisor de trabajos detenido")
+
+def start_worker_processes(count):
+    """
+    Lanza el proceso supervisor de `count` workers y devuelve su Popen. Para
+    pararlo basta con terminate(): el supervisor termina sus workers antes de salir.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, os.path.join(root, 'worker.py'), '--processes', str(count)], cwd=root
+    )
+
+def stop_worker_processes(supervisor, timeout=15):
+    """Termina el supervisor lanzado por start_worker_processes y espera a que salga"""
+    _stop_processes([supervisor], timeout)
@@ -1,16 +1,13 @@
-import os
-from googleapiclient.discovery import build
 from datetime import datetime
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import KEYWORD_POSITION_WORKERS, KEYWORD_POSITION_MAX_BATCH
+from services.youtube_api import get_youtube_client
+from services.quota import limit_max_results, get_request_usage
+from services import singleflight, rank_history, serp_store
 
-# Configurar la API de YouTube
-api_key = os.environ.get('YOUTUBE_API_KEY')
-if api_key:
-    youtube = build('youtube', 'v3', developerKey=api_key)
-else:
-    youtube = None
-
-def search_channel_position(keyword, channel_id, max_results=100):
+def search_channel_position(keyword, channel_id, max_results=100, max_hits=None, channel_info=None):
     """
     Busca la posición de un canal específico en los resultados de búsqueda de YouTube
     
@@ -18,69 +15,51 @@ def search_channel_position(keyword, channel_id, max_results=100):
         keyword (str): Palabra clave para buscar
         channel_id (str): ID del canal a buscar
         max_results (int): Número máximo de resultados a analizar (por defecto 100)
+        max_hits (int): Si se indica, la búsqueda termina al encontrar ese número de
+                        videos del canal (1 = solo la mejor posición) y no se piden
+                        más páginas (cada página de search.list cuesta 100 unidades)
+        channel_info (dict): Información del canal ya obtenida con get_channel_info;
+                             si se pasa, no se vuelve a consultar
     
     Returns:
         dict: Información sobre las posiciones encontradas y videos del canal
     """
+    youtube = get_youtube_client()
     if not youtube:
         raise Exception("API de YouTube no configurada. Verifica la variable YOUTUBE_API_KEY")
     
+    # Si el presupuesto diario de cuota está casi agotado se analizan menos resultados
+    max_results = limit_max_results(max_results)
+    
     try:
-        found_videos = []
-        position = 1
-        next_page_token = None
+        matches = []
         total_searched = 0
+        stopped_early = False
         
         logging.info(f"Buscando canal {channel_id} para la palabra clave: {keyword}")
         
-        while total_searched < max_results:
-            # Determinar cuántos resultados obtener en esta página
-            results_to_get = min(50, max_results - total_searched)
-            
-            request = youtube.search().list(
-                q=keyword,
-                type='video',
-                part='id,snippet',
-                maxResults=results_to_get,
-                pageToken=next_page_token
-            )
-            response = request.execute()
-            
-            for item in response['items']:
-                video_channel_id = item['snippet']['channelId']
+        # Los resultados salen de la instantánea compartida de la búsqueda: solo se
+        # piden a la API las páginas que aún no ha descargado ningún informe
+        for position, item in enumerate(serp_store.iter_search_results(keyword, max_results=max_results), start=1):
+            total_searched = position
+            if item['snippet']['channelId'] == channel_id:
+                matches.append((position, item))
+                logging.info(f"Video encontrado en posición {position}: {item['snippet']['title']}")
                 
-                if video_channel_id == channel_id:
-                    # Obtener estadísticas del video
-                    video_id = item['id']['videoId']
-                    video_stats = get_video_statistics(video_id)
-                    
-                    video_info = {
-                        'position': position,
-                        'title': item['snippet']['title'],
-                        'video_id': video_id,
-                        'video_url': f"https://www.youtube.com/watch?v={video_id}",
-                        'thumbnail': item['snippet']['thumbnails'].get('medium', {}).get('url', ''),
-                        'published_at': datetime.strptime(item['snippet']['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"),
-                        'description': item['snippet'].get('description', '')[:200] + '...' if len(item['snippet'].get('description', '')) > 200 else item['snippet'].get('description', ''),
-                        'views': video_stats.get('views', 0),
-                        'likes': video_stats.get('likes', 0),
-                        'comments': video_stats.get('comments', 0)
-                    }
-                    found_videos.append(video_info)
-                    logging.info(f"Video encontrado en posición {position}: {item['snippet']['title']}")
-                
-                position += 1
-                total_searched += 1
-                
-                if total_searched >= max_results:
+                if max_hits and len(matches) >= max_hits:
+                    stopped_early = True
                     break
-            
-            next_page_token = response.get('nextPageToken')
-            if not next_page_token:
-                break
+        
+        # Estadísticas de todos los videos del canal en una llamada por cada 50
+        stats = get_videos_statistics([item['id']['videoId'] for _, item in matches])
+        found_videos = [build_found_video(video_position, item, stats) for video_position, item in matches]
+        
+        if stopped_early:
+            logging.info(f"Búsqueda detenida tras encontrar {len(found_videos)} videos del canal en la posición {total_searched}")
         
         # Obtener información del canal
-        channel_info = get_channel_info(channel_id)
+        if channel_info is None:
+            channel_info = get_channel_info(channel_id)
         
         result = {
             'keyword': keyword,
@@ -90,9 +69,15 @@ def search_channel_position(keyword, channel_id, max_results=100):
             'found_videos': found_videos,
             'total_found': len(found_videos),
             'best_position': found_videos[0]['position'] if found_videos else None,
-            'search_date': datetime.now()
+            'max_hits': max_hits,
+            'stopped_early': stopped_early,
+            'search_date': datetime.now(),
+            'quota': get_request_usage()
         }
         
+        # Guardar la posición en el historial y compararla con la observación anterior
+        result['previous_rank'] = rank_history.record_result(result)
+        
         logging.info(f"Búsqueda completada. Encontrados {len(found_videos)} videos del canal en {total_searched} resultados")
         return result
         
@@ -100,29 +85,116 @@ def search_channel_position(keyword, channel_id, max_results=100):
         logging.error(f"Error en la búsqueda: {str(e)}")
         raise Exception(f"Error al buscar posiciones del canal: {str(e)}")
 
-def get_video_statistics(video_id):
-    """Obtiene las estadísticas de un video específico"""
+def normalize_keywords(keywords, limit=KEYWORD_POSITION_MAX_BATCH):
+    """Palabras clave sin vacías ni duplicadas (sin distinguir mayúsculas), como mucho `limit`"""
+    unique = []
+    seen = set()
+    for keyword in keywords:
+        keyword = ' '.join(keyword.split())
+        if keyword and keyword.casefold() not in seen:
+            seen.add(keyword.casefold())
+            unique.append(keyword)
+    return unique[:limit]
+
+def iter_channel_positions(keywords, channel_id, max_results=100, max_hits=None, channel_info=None,
+                           max_workers=KEYWORD_POSITION_WORKERS):
+    """
+    Busca la posición del canal para varias palabras clave a la vez y genera el
+    resultado de cada una en cuanto termina (en orden de finalización).
+    
+    La información del canal se obtiene una sola vez para todo el lote. Las
+    búsquedas se ejecutan como mucho de `max_workers` en `max_workers`, comparten la
+    caché de la API y se coalescen con los informes individuales idénticos en curso.
+    Si una palabra clave falla, su resultado es {'keyword': ..., 'error': ...}.
+    """
+    if channel_info is None:
+        channel_info = get_channel_info(channel_id)
+    
+    def search(keyword):
+        key = singleflight.make_key('keyword_position_report', keyword, channel_id, max_results, max_hits)
+        return singleflight.do(key, search_channel_position, keyword, channel_id, max_results, max_hits, channel_info)
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keywords))))
     try:
-        request = youtube.videos().list(
-            part='statistics',
-            id=video_id
-        )
-        response = request.execute()
-        
-        if 'items' in response and len(response['items']) > 0:
-            stats = response['items'][0]['statistics']
-            return {
-                'views': int(stats.get('viewCount', 0)),
-                'likes': int(stats.get('likeCount', 0)),
-                'comments': int(stats.get('commentCount', 0))
-            }
-    except Exception as e:
-        logging.error(f"Error obteniendo estadísticas del video {video_id}: {str(e)}")
+        # Cada búsqueda se ejecuta en una copia del contexto para que su consumo de
+        # cuota se registre en la petición actual
+        futures = {
+            executor.submit(contextvars.copy_context().run, search, keyword): keyword
+            for keyword in keywords
+        }
+        for future in as_completed(futures):
+            keyword = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                logging.error(f"Error buscando la posición para '{keyword}': {str(e)}")
+                yield {'keyword': keyword, 'error': str(e)}
+    finally:
+        # Si el cliente se desconecta (GeneratorExit) no se esperan ni se lanzan las
+        # búsquedas pendientes: consumirían cuota sin nadie que lea el resultado
+        executor.shutdown(wait=False, cancel_futures=True)
+
+EMPTY_STATISTICS = {'views': 0, 'likes': 0, 'comments': 0}
+
+def build_found_video(position, item, stats_by_id):
+    """Datos de un video del canal encontrado en los resultados de búsqueda"""
+    snippet = item['snippet']
+    video_id = item['id']['videoId']
+    video_stats = stats_by_id.get(video_id, EMPTY_STATISTICS)
+    description = snippet.get('description', '')
     
-    return {'views': 0, 'likes': 0, 'comments': 0}
+    return {
+        'position': position,
+        'title': snippet['title'],
+        'video_id': video_id,
+        'video_url': f"https://www.youtube.com/watch?v={video_id}",
+        'thumbnail': snippet['thumbnails'].get('medium', {}).get('url', ''),
+        'published_at': datetime.strptime(snippet['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"),
+        'description': description[:200] + '...' if len(description) > 200 else description,
+        'views': video_stats.get('views', 0),
+        'likes': video_stats.get('likes', 0),
+        'comments': video_stats.get('comments', 0)
+    }
+
+def get_videos_statistics(video_ids, batch_size=50):
+    """
+    Obtiene las estadísticas de varios videos con una llamada a videos.list por
+    cada `batch_size` IDs (máximo permitido por la API: 50)
+    
+    Returns:
+        dict: video_id -> {'views', 'likes', 'comments'}
+    """
+    youtube = get_youtube_client()
+    stats_by_id = {}
+    
+    for i in range(0, len(video_ids), batch_size):
+        batch = video_ids[i:i + batch_size]
+        try:
+            request = youtube.videos().list(
+                part='statistics',
+                id=','.join(batch)
+            )
+            response = request.execute()
+            
+            for item in response.get('items', []):
+                stats = item.get('statistics', {})
+                stats_by_id[item['id']] = {
+                    'views': int(stats.get('viewCount', 0)),
+                    'likes': int(stats.get('likeCount', 0)),
+                    'comments': int(stats.get('commentCount', 0))
+                }
+        except Exception as e:
+            logging.error(f"Error obteniendo estadísticas de los videos {', '.join(batch)}: {str(e)}")
+    
+    return stats_by_id
+
+def get_video_statistics(video_id):
+    """Obtiene las estadísticas de un video específico"""
+    return get_videos_statistics([video_id]).get(video_id, dict(EMPTY_STATISTICS))
 
 def get_channel_info(channel_id):
     """Obtiene información básica del canal"""
+    youtube = get_youtube_client()
     try:
         request = youtube.channels().list(
             part='snippet,statistics',
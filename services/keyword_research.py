@@ -1,20 +1,71 @@
+import io
+import csv
 import requests
 import json
+import string
 import logging
 from urllib.parse import quote
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from config import KEYWORD_EXPANSION_WORKERS, KEYWORD_SUGGESTIONS_TTL
+from services.cache_store import TTLCache
+from services.http_sessions import get_session
+from services.singleflight import make_key
 
-def search_keyword_suggestions(keyword, max_retries=3):
+# URL de la YouTube Suggest API (no oficial)
+SUGGEST_URL = "https://suggestqueries.google.com/complete/search"
+
+SUGGEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': '*/*',
+    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+    'Connection': 'keep-alive',
+}
+
+# Resultados compartidos por la página de resultados y las exportaciones (todos
+# los workers). Incluyen la fecha de la búsqueda (datetime), que JSON no representa
+_suggestions_cache = TTLCache('keyword_suggestions', default_ttl=KEYWORD_SUGGESTIONS_TTL, pickle_values=True)
+
+# Líneas por bloque en las exportaciones generadas por streaming
+EXPORT_CHUNK_LINES = 500
+
+# Variantes de la expansión "alphabet soup": keyword + a…z, keyword + 0…9 y a…z + keyword
+EXPANSION_SUFFIXES = string.ascii_lowercase + string.digits
+EXPANSION_PREFIXES = string.ascii_lowercase
+
+def get_keyword_suggestions(keyword, expand=False):
+    """
+    Devuelve las sugerencias de la palabra clave desde la caché, o las busca con
+    search_keyword_suggestions y las guarda si la búsqueda tuvo éxito. La clave es
+    la palabra clave normalizada (espacios y mayúsculas) y el modo de búsqueda, de
+    modo que una exportación devuelve exactamente lo que se mostró en los resultados.
+    """
+    key = make_key('keyword_suggestions', keyword, bool(expand))
+    result = _suggestions_cache.get(key)
+    if result is not None:
+        logging.info(f"Sugerencias de '{keyword}' servidas desde la caché")
+        return result
+    
+    result = search_keyword_suggestions(keyword, expand=expand)
+    if result.get('status') == 'success':
+        _suggestions_cache.set(key, result)
+    return result
+
+def search_keyword_suggestions(keyword, max_retries=3, expand=False):
     """
     Busca sugerencias de palabras clave usando la YouTube Suggest API
     
     Args:
         keyword (str): Palabra clave base para buscar sugerencias
         max_retries (int): Número máximo de reintentos en caso de fallo
+        expand (bool): Si es True, usa la expansión concurrente (expand_keyword_suggestions)
     
     Returns:
         dict: Información sobre las sugerencias encontradas
     """
+    if expand:
+        return expand_keyword_suggestions(keyword)
+    
     try:
         if not keyword or not keyword.strip():
             raise Exception("La palabra clave no puede estar vacía")
@@ -22,27 +73,18 @@ def search_keyword_suggestions(keyword, max_retries=3):
         keyword = keyword.strip()
         logging.info(f"Buscando sugerencias para: {keyword}")
         
-        # URL de la YouTube Suggest API (no oficial) - usando parámetros más simples
-        base_url = "https://suggestqueries.google.com/complete/search"
-        
+        # Parámetros simples de la Suggest API
         params = {
             'client': 'youtube',
             'ds': 'yt', 
             'q': keyword
         }
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': '*/*',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive',
-        }
-        
         for attempt in range(max_retries):
             try:
                 logging.info(f"Intento {attempt + 1} de búsqueda para: {keyword}")
                 
-                response = requests.get(base_url, params=params, headers=headers, timeout=15)
+                response = get_session('suggest').get(SUGGEST_URL, params=params, headers=SUGGEST_HEADERS, timeout=15)
                 response.raise_for_status()
                 
                 logging.info(f"Respuesta recibida. Status: {response.status_code}")
@@ -57,54 +99,13 @@ def search_keyword_suggestions(keyword, max_retries=3):
                         return create_empty_result(keyword, "Respuesta vacía del servidor")
                     continue
                 
-                # Intentar parsear como JSON directo primero
-                suggestions = []
                 try:
-                    data = json.loads(content)
-                    suggestions = extract_suggestions_from_json(data, keyword)
-                    logging.info(f"Parseado JSON directo exitoso, {len(suggestions)} sugerencias")
-                except json.JSONDecodeError:
-                    # Si falla, intentar limpiar respuesta JSONP
-                    logging.info("JSON directo falló, intentando limpiar JSONP")
-                    try:
-                        # Buscar el inicio del array JSON
-                        start_idx = content.find('[')
-                        if start_idx == -1:
-                            logging.warning("No se encontró inicio de array JSON")
-                            if attempt == max_retries - 1:
-                                return create_empty_result(keyword, "Formato de respuesta inválido")
-                            continue
-                        
-                        # Buscar el final del array JSON
-                        bracket_count = 0
-                        end_idx = start_idx
-                        for i, char in enumerate(content[start_idx:], start_idx):
-                            if char == '[':
-                                bracket_count += 1
-                            elif char == ']':
-                                bracket_count -= 1
-                                if bracket_count == 0:
-                                    end_idx = i + 1
-                                    break
-                        
-                        if bracket_count != 0:
-                            logging.warning("Array JSON malformado")
-                            if attempt == max_retries - 1:
-                                return create_empty_result(keyword, "Array JSON malformado")
-                            continue
-                        
-                        json_content = content[start_idx:end_idx]
-                        logging.info(f"JSON extraído: {json_content[:100]}...")
-                        
-                        data = json.loads(json_content)
-                        suggestions = extract_suggestions_from_json(data, keyword)
-                        logging.info(f"Parseado JSONP exitoso, {len(suggestions)} sugerencias")
-                        
-                    except Exception as parse_error:
-                        logging.error(f"Error parseando respuesta: {str(parse_error)}")
-                        if attempt == max_retries - 1:
-                            return create_empty_result(keyword, f"Error parseando respuesta: {str(parse_error)}")
-                        continue
+                    suggestions = parse_suggestions_response(content, keyword)
+                except ValueError as parse_error:
+                    logging.error(f"Error parseando respuesta: {str(parse_error)}")
+                    if attempt == max_retries - 1:
+                        return create_empty_result(keyword, str(parse_error))
+                    continue
                 
                 # Crear resultado exitoso
                 logging.info(f"Búsqueda completada exitosamente: {len(suggestions)} sugerencias únicas")
@@ -137,6 +138,125 @@ def search_keyword_suggestions(keyword, max_retries=3):
         logging.error(f"Error crítico en search_keyword_suggestions: {str(e)}")
         return create_empty_result(keyword, f"Error crítico: {str(e)}")
 
+def fetch_suggestions(query, keyword):
+    """
+    Una sola llamada a la Suggest API, sin reintentos. Devuelve las sugerencias de
+    `query` (excluyendo la propia palabra clave base) o None si la llamada falla.
+    """
+    try:
+        params = {'client': 'youtube', 'ds': 'yt', 'q': query}
+        response = get_session('suggest').get(SUGGEST_URL, params=params, headers=SUGGEST_HEADERS, timeout=15)
+        response.raise_for_status()
+        content = response.text.strip()
+        return parse_suggestions_response(content, keyword) if content else []
+    except (requests.RequestException, ValueError) as e:
+        logging.warning(f"Error obteniendo sugerencias para '{query}': {str(e)}")
+        return None
+
+def get_expansion_queries(keyword):
+    """Consultas de la expansión: la palabra clave base seguida de sus variantes"""
+    return (
+        [keyword]
+        + [f"{keyword} {char}" for char in EXPANSION_SUFFIXES]
+        + [f"{char} {keyword}" for char in EXPANSION_PREFIXES]
+    )
+
+def expand_keyword_suggestions(keyword, max_workers=KEYWORD_EXPANSION_WORKERS):
+    """
+    Expansión "alphabet soup": consulta la palabra clave base y sus variantes con
+    letras y números de forma concurrente (como mucho `max_workers` llamadas a la
+    vez, reutilizando las conexiones del pool) y combina los resultados sin
+    duplicados, sin distinguir mayúsculas. Devuelve cientos de sugerencias en el
+    tiempo de unas pocas llamadas.
+    
+    Returns:
+        dict: Mismo formato que search_keyword_suggestions, más 'expanded',
+              'queries' y 'failed_queries'
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return create_empty_result(keyword, "La palabra clave no puede estar vacía")
+    
+    queries = get_expansion_queries(keyword)
+    logging.info(f"Expandiendo sugerencias para '{keyword}': {len(queries)} consultas")
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+        # map conserva el orden de las consultas: primero las de la palabra base
+        results = list(executor.map(lambda query: fetch_suggestions(query, keyword), queries))
+    
+    suggestions = []
+    seen = set()
+    for query_suggestions in results:
+        for suggestion in query_suggestions or []:
+            suggestion_lower = suggestion.lower()
+            if suggestion_lower not in seen:
+                seen.add(suggestion_lower)
+                suggestions.append(suggestion)
+    
+    failed_queries = sum(1 for query_suggestions in results if query_suggestions is None)
+    if failed_queries == len(queries):
+        return create_empty_result(keyword, "Todos los intentos de búsqueda fallaron")
+    
+    logging.info(f"Expansión completada: {len(suggestions)} sugerencias únicas, {failed_queries} consultas fallidas")
+    
+    return {
+        'keyword': keyword,
+        'suggestions': suggestions,
+        'total_suggestions': len(suggestions),
+        'search_date': datetime.now(),
+        'has_suggestions': len(suggestions) > 0,
+        'status': 'success',
+        'expanded': True,
+        'queries': len(queries),
+        'failed_queries': failed_queries
+    }
+
+def parse_suggestions_response(content, keyword):
+    """
+    Parsea la respuesta de la Suggest API (JSON directo o JSONP) y devuelve sus
+    sugerencias. Lanza ValueError si la respuesta no tiene el formato esperado.
+    """
+    # Intentar parsear como JSON directo primero
+    try:
+        data = json.loads(content)
+        suggestions = extract_suggestions_from_json(data, keyword)
+        logging.info(f"Parseado JSON directo exitoso, {len(suggestions)} sugerencias")
+        return suggestions
+    except json.JSONDecodeError:
+        # Si falla, intentar limpiar respuesta JSONP
+        logging.info("JSON directo falló, intentando limpiar JSONP")
+    
+    # Buscar el inicio del array JSON
+    start_idx = content.find('[')
+    if start_idx == -1:
+        raise ValueError("Formato de respuesta inválido")
+    
+    # Buscar el final del array JSON
+    bracket_count = 0
+    end_idx = start_idx
+    for i, char in enumerate(content[start_idx:], start_idx):
+        if char == '[':
+            bracket_count += 1
+        elif char == ']':
+            bracket_count -= 1
+            if bracket_count == 0:
+                end_idx = i + 1
+                break
+    
+    if bracket_count != 0:
+        raise ValueError("Array JSON malformado")
+    
+    json_content = content[start_idx:end_idx]
+    logging.info(f"JSON extraído: {json_content[:100]}...")
+    
+    try:
+        data = json.loads(json_content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error parseando respuesta: {str(e)}")
+    suggestions = extract_suggestions_from_json(data, keyword)
+    logging.info(f"Parseado JSONP exitoso, {len(suggestions)} sugerencias")
+    return suggestions
+
 def extract_suggestions_from_json(data, original_keyword):
     """
     Extrae sugerencias de la estructura JSON de respuesta
@@ -195,57 +315,75 @@ def create_empty_result(keyword, error_message="No se encontraron sugerencias"):
         'error_message': error_message
     }
 
-def format_suggestions_for_export(suggestions, keyword):
-    """
-    Formatea las sugerencias para exportación
-    
-    Args:
-        suggestions (list): Lista de sugerencias
-        keyword (str): Palabra clave original
-    
-    Returns:
-        dict: Datos formateados para diferentes tipos de exportación
-    """
-    try:
-        # Formato texto plano
-        text_format = f"Sugerencias de YouTube para: {keyword}\n"
-        text_format += f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n"
-        text_format += f"Total de sugerencias: {len(suggestions)}\n\n"
-        
-        for i, suggestion in enumerate(suggestions, 1):
-            text_format += f"{i}. {suggestion}\n"
-        
-        # Formato CSV
-        csv_format = "Número,Sugerencia\n"
+def _in_chunks(lines, lines_per_chunk=EXPORT_CHUNK_LINES):
+    """Agrupa las líneas en bloques para no escribir la respuesta línea a línea"""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= lines_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def iter_suggestions_txt(suggestions, keyword):
+    """Exportación en texto plano, generada por bloques"""
+    def lines():
+        yield f"Sugerencias de YouTube para: {keyword}\n"
+        yield f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n"
+        yield f"Total de sugerencias: {len(suggestions)}\n\n"
         for i, suggestion in enumerate(suggestions, 1):
-            # Escapar comillas en CSV
-            escaped_suggestion = suggestion.replace('"', '""')
-            csv_format += f'{i},"{escaped_suggestion}"\n'
-        
-        # Formato JSON
-        json_format = {
+            yield f"{i}. {suggestion}\n"
+    return _in_chunks(lines())
+
+def iter_suggestions_csv(suggestions, keyword):
+    """Exportación CSV (el módulo csv se encarga de escapar comillas y separadores)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['Número', 'Sugerencia'])
+    for i, suggestion in enumerate(suggestions, 1):
+        writer.writerow([i, suggestion])
+        if i % EXPORT_CHUNK_LINES == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_suggestions_json(suggestions, keyword):
+    """Exportación JSON (un documento), generada por bloques sin construirlo en memoria"""
+    def lines():
+        header = json.dumps({
             'keyword': keyword,
             'generated_date': datetime.now().isoformat(),
-            'total_suggestions': len(suggestions),
-            'suggestions': [
-                {
-                    'position': i,
-                    'text': suggestion
-                }
-                for i, suggestion in enumerate(suggestions, 1)
-            ]
-        }
-        
-        return {
-            'text': text_format,
-            'csv': csv_format,
-            'json': json.dumps(json_format, indent=2, ensure_ascii=False)
-        }
-        
-    except Exception as e:
-        logging.error(f"Error formateando sugerencias para exportación: {str(e)}")
-        return {
-            'text': f"Error formateando datos: {str(e)}",
-            'csv': f"Error,{str(e)}",
-            'json': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+            'total_suggestions': len(suggestions)
+        }, indent=2, ensure_ascii=False)
+        yield header[:-2] + ',\n  "suggestions": ['
+        for i, suggestion in enumerate(suggestions, 1):
+            # Igual que json.dumps({'position': i, 'text': suggestion}), pero solo se codifica el texto
+            yield f'{"," if i > 1 else ""}\n    {{"position": {i}, "text": {json.dumps(suggestion, ensure_ascii=False)}}}'
+        yield "\n  ]\n}" if suggestions else "]\n}"
+    return _in_chunks(lines())
+
+def iter_suggestions_jsonl(suggestions, keyword):
+    """Exportación JSON Lines: una sugerencia por línea"""
+    encoded_keyword = json.dumps(keyword, ensure_ascii=False)
+    return _in_chunks(
+        f'{{"keyword": {encoded_keyword}, "position": {i}, "text": {json.dumps(suggestion, ensure_ascii=False)}}}\n'
+        for i, suggestion in enumerate(suggestions, 1)
+    )
+
+# Formatos de exportación: formato -> (generador, Content-Type)
+EXPORT_FORMATS = {
+    'txt': (iter_suggestions_txt, 'text/plain; charset=utf-8'),
+    'csv': (iter_suggestions_csv, 'text/csv; charset=utf-8'),
+    'json': (iter_suggestions_json, 'application/json; charset=utf-8'),
+    'jsonl': (iter_suggestions_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+
+def iter_suggestions_export(suggestions, keyword, format_type):
+    """
+    Genera por bloques la exportación de las sugerencias en un único formato
+    (txt, csv, json o jsonl), para enviarla directamente en la respuesta
+    """
+    writer, _ = EXPORT_FORMATS[format_type]
+    return writer(suggestions, keyword)
@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from config import DAILY_QUOTA_BUDGET, QUOTA_DEGRADE_THRESHOLD, QUOTA_DEGRADED_MAX_RESULTS
+from services.cache_store import get_connection
+
+try:
+    from zoneinfo import ZoneInfo
+    # La cuota diaria de YouTube Data API se reinicia a medianoche, hora del Pacífico
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except Exception:
+    QUOTA_TIMEZONE = timezone.utc
+
+# Coste en unidades de cada endpoint (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    'youtube.search.list': 100,
+    'youtube.captions.list': 50,
+    'youtube.captions.download': 200,
+}
+DEFAULT_QUOTA_COST = 1
+
+# Segundos durante los que se reutiliza el total diario leído de la base de datos
+USAGE_REFRESH_SECONDS = 5
+
+_ledger = ContextVar('quota_ledger', default=None)
+_lock = threading.Lock()
+_table_ready_pid = None
+_cached_usage = {'day': None, 'units': 0, 'read_at': 0.0}
+
+def _connection():
+    global _table_ready_pid
+    connection = get_connection()
+    if _table_ready_pid != os.getpid():
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                day TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                units INTEGER NOT NULL,
+                PRIMARY KEY (day, endpoint, feature)
+            ) WITHOUT ROWID
+        """)
+        _table_ready_pid = os.getpid()
+    return connection
+
+def quota_day():
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+def get_cost(method_id):
+    return QUOTA_COSTS.get(method_id, DEFAULT_QUOTA_COST)
+
+def start_request(feature):
+    """Abre el registro de consumo de la petición actual para una funcionalidad"""
+    _ledger.set({'feature': feature, 'units': 0, 'calls': 0, 'endpoints': {}, 'degraded': False})
+
+def end_request():
+    _ledger.set(None)
+
+def get_request_usage():
+    """Consumo de la petición actual, para incluirlo en el resultado de cada informe"""
+    ledger = _ledger.get()
+    if ledger is None:
+        return {'feature': None, 'units': 0, 'calls': 0, 'endpoints': {}, 'degraded': False}
+    with _lock:
+        return {**ledger, 'endpoints': dict(ledger['endpoints'])}
+
+def record_usage(method_id):
+    """Registra una llamada real (no cacheada) a la API en la petición y en el total diario"""
+    units = get_cost(method_id)
+    ledger = _ledger.get()
+    feature = ledger['feature'] if ledger else 'other'
+    if ledger is not None:
+        # Una petición puede repartir sus llamadas entre varios hilos
+        with _lock:
+            ledger['units'] += units
+            ledger['calls'] += 1
+            ledger['endpoints'][method_id] = ledger['endpoints'].get(method_id, 0) + units
+
+    day = quota_day()
+    try:
+        _connection().execute("""
+            INSERT INTO quota_usage (day, endpoint, feature, calls, units) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (day, endpoint, feature) DO UPDATE SET calls = calls + 1, units = units + excluded.units
+        """, (day, method_id, feature, units))
+    except Exception as e:
+        logging.warning(f"Error registrando el consumo de cuota: {e}")
+
+    with _lock:
+        if _cached_usage['day'] == day:
+            _cached_usage['units'] += units
+
+def get_daily_usage():
+    """Unidades consumidas hoy por todos los workers"""
+    day = quota_day()
+    with _lock:
+        if _cached_usage['day'] == day and time.time() - _cached_usage['read_at'] < USAGE_REFRESH_SECONDS:
+            return _cached_usage['units']
+    try:
+        units = _connection().execute(
+            'SELECT COALESCE(SUM(units), 0) FROM quota_usage WHERE day = ?', (day,)
+        ).fetchone()[0]
+    except Exception as e:
+        logging.warning(f"Error leyendo el consumo de cuota: {e}")
+        return 0
+    with _lock:
+        _cached_usage.update(day=day, units=units, read_at=time.time())
+    return units
+
+def is_degraded():
+    """
+    Indica si el consumo diario ha superado el umbral del presupuesto. En ese caso
+    los servicios reducen el trabajo en lugar de agotar la cuota y fallar con
+    quotaExceeded; la petición actual queda marcada como degradada.
+    """
+    if not DAILY_QUOTA_BUDGET:
+        return False
+    degraded = get_daily_usage() >= DAILY_QUOTA_BUDGET * QUOTA_DEGRADE_THRESHOLD
+    if degraded:
+        ledger = _ledger.get()
+        if ledger is not None:
+            ledger['degraded'] = True
+    return degraded
+
+def limit_max_results(max_results, degraded_max=QUOTA_DEGRADED_MAX_RESULTS):
+    """Devuelve max_results, o como mucho degraded_max si el presupuesto está en modo degradado"""
+    if max_results > degraded_max and is_degraded():
+        logging.warning(f"Presupuesto de cuota superado: max_results reducido de {max_results} a {degraded_max}")
+        return degraded_max
+    return max_results
+
+def get_quota_report():
+    """Resumen del consumo de hoy por endpoint y por funcionalidad"""
+    day = quota_day()
+    by_endpoint = {}
+    by_feature = {}
+    try:
+        for endpoint, feature, calls, units in _connection().execute(
+            'SELECT endpoint, feature, calls, units FROM quota_usage WHERE day = ?', (day,)
+        ):
+            for key, totals in ((endpoint, by_endpoint), (feature, by_feature)):
+                entry = totals.setdefault(key, {'calls': 0, 'units': 0})
+                entry['calls'] += calls
+                entry['units'] += units
+    except Exception as e:
+        logging.warning(f"Error generando el informe de cuota: {e}")
+
+    used = sum(entry['units'] for entry in by_endpoint.values())
+    return {
+        'day': day,
+        'budget': DAILY_QUOTA_BUDGET,
+        'degrade_threshold': QUOTA_DEGRADE_THRESHOLD,
+        'used_units': used,
+        'remaining_units': max(DAILY_QUOTA_BUDGET - used, 0) if DAILY_QUOTA_BUDGET else None,
+        'degraded': bool(DAILY_QUOTA_BUDGET) and used >= DAILY_QUOTA_BUDGET * QUOTA_DEGRADE_THRESHOLD,
+        'by_endpoint': by_endpoint,
+        'by_feature': by_feature
+    }
@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+
+from config import RANK_TREND_THRESHOLD
+from services.cache_store import get_connection
+
+RANK_HISTORY_DB_NAME = 'rank_history.sqlite3'
+
+_table_ready_pid = None
+
+def _connection():
+    """
+    Historial de posiciones, solo de inserción. Las palabras clave, canales y
+    videos se guardan una vez en tablas diccionario y cada observación es una fila
+    de enteros (par, instante, posición, video, resultados analizados) agrupada
+    físicamente por par y fecha, de modo que las consultas por rango de fechas de
+    un par leen filas contiguas.
+    """
+    global _table_ready_pid
+    connection = get_connection(RANK_HISTORY_DB_NAME)
+    if _table_ready_pid != os.getpid():
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS rank_pairs (
+                id INTEGER PRIMARY KEY,
+                keyword TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                UNIQUE (keyword, channel_id)
+            )
+        """)
+        connection.execute('CREATE INDEX IF NOT EXISTS idx_rank_pairs_channel ON rank_pairs (channel_id)')
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS rank_videos (
+                id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL UNIQUE
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS rank_observations (
+                pair_id INTEGER NOT NULL,
+                observed_at INTEGER NOT NULL,
+                position INTEGER,
+                video_ref INTEGER,
+                searched INTEGER,
+                PRIMARY KEY (pair_id, observed_at)
+            ) WITHOUT ROWID
+        """)
+        _table_ready_pid = os.getpid()
+    return connection
+
+def normalize_keyword(keyword):
+    return ' '.join(keyword.split()).casefold()
+
+def _get_or_create_id(connection, table, columns, values):
+    where = ' AND '.join(f"{column} = ?" for column in columns)
+    row = connection.execute(f"SELECT id FROM {table} WHERE {where}", values).fetchone()
+    if row:
+        return row[0]
+    placeholders = ', '.join('?' for _ in columns)
+    connection.execute(
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values
+    )
+    return connection.execute(f"SELECT id FROM {table} WHERE {where}", values).fetchone()[0]
+
+def record_rank(keyword, channel_id, position, video_id=None, searched=None, observed_at=None):
+    """
+    Añade una observación de la posición de un canal para una palabra clave
+    (position None: no apareció entre los `searched` resultados analizados).
+
+    Returns:
+        dict: La observación anterior del mismo par ({'position', 'video_id',
+              'searched', 'observed_at'}) o None si es la primera
+    """
+    observed_at = int(observed_at if observed_at is not None else time.time())
+    connection = _connection()
+    pair_id = _get_or_create_id(connection, 'rank_pairs', ('keyword', 'channel_id'),
+                                (normalize_keyword(keyword), channel_id))
+    video_ref = _get_or_create_id(connection, 'rank_videos', ('video_id',), (video_id,)) if video_id else None
+
+    previous = connection.execute("""
+        SELECT o.position, v.video_id, o.searched, o.observed_at
+        FROM rank_observations o LEFT JOIN rank_videos v ON v.id = o.video_ref
+        WHERE o.pair_id = ? AND o.observed_at < ?
+        ORDER BY o.observed_at DESC LIMIT 1
+    """, (pair_id, observed_at)).fetchone()
+
+    # La clave es (par, segundo): una segunda observación del mismo par en el mismo
+    # segundo sustituye a la anterior, de modo que se conserva la más reciente
+    # (la última búsqueda) en lugar de descartarla
+    connection.execute(
+        'INSERT OR REPLACE INTO rank_observations (pair_id, observed_at, position, video_ref, searched) VALUES (?, ?, ?, ?, ?)',
+        (pair_id, observed_at, position, video_ref, searched)
+    )
+
+    if not previous:
+        return None
+    return dict(zip(('position', 'video_id', 'searched', 'observed_at'), previous))
+
+def _pair_filter(keyword, channel_id):
+    """Condición SQL (con parámetros con nombre) que limita las observaciones a los pares filtrados"""
+    conditions = []
+    params = {}
+    if keyword is not None:
+        conditions.append('keyword = :keyword')
+        params['keyword'] = normalize_keyword(keyword)
+    if channel_id is not None:
+        conditions.append('channel_id = :channel_id')
+        params['channel_id'] = channel_id
+    if not conditions:
+        return '', params
+    return f"AND pair_id IN (SELECT id FROM rank_pairs WHERE {' AND '.join(conditions)})", params
+
+def get_history(keyword=None, channel_id=None, since=None, until=None):
+    """
+    Serie temporal de cada par (palabra clave, canal) que coincide con los filtros,
+    entre `since` y `until` (segundos epoch, incluidos)
+
+    Returns:
+        list: [{'keyword', 'channel_id', 'points': [(observed_at, position, video_id), ...]}]
+    """
+    pair_filter, params = _pair_filter(keyword, channel_id)
+    rows = _connection().execute(f"""
+        SELECT p.keyword, p.channel_id, o.observed_at, o.position, v.video_id
+        FROM rank_observations o
+        JOIN rank_pairs p ON p.id = o.pair_id
+        LEFT JOIN rank_videos v ON v.id = o.video_ref
+        WHERE o.observed_at BETWEEN :since AND :until {pair_filter}
+        ORDER BY o.pair_id, o.observed_at
+    """, {'since': since or 0, 'until': until or 2 ** 62, **params})
+
+    series = []
+    for keyword_value, channel_value, observed_at, position, video_id in rows:
+        if not series or series[-1]['keyword'] != keyword_value or series[-1]['channel_id'] != channel_value:
+            series.append({'keyword': keyword_value, 'channel_id': channel_value, 'points': []})
+        series[-1]['points'].append((observed_at, position, video_id))
+    return series
+
+def get_movements(keyword=None, channel_id=None, since=None):
+    """
+    Variación y tendencia de la posición de cada par desde `since` (segundos
+    epoch), calculadas en una sola consulta agregada:
+
+    - delta: posición anterior - última (positivo = el canal ha subido)
+    - slope: pendiente de la recta de mínimos cuadrados de la posición, en
+      posiciones por día (negativo = el canal sube)
+    - trend: 'up', 'down' o 'stable' según la pendiente y RANK_TREND_THRESHOLD
+
+    Las observaciones sin posición (el canal no apareció) cuentan para la última
+    y la anterior posición pero no para la pendiente ni la mejor posición.
+    """
+    since = since or 0
+    pair_filter, params = _pair_filter(keyword, channel_id)
+    # Los agregados recorren las filas en el orden de la clave primaria (par,
+    # instante), sin ordenar; la última y la penúltima posición son búsquedas
+    # directas por la clave primaria
+    rows = _connection().execute(f"""
+        WITH stats AS (
+            SELECT pair_id,
+                   COUNT(*) AS observations,
+                   MAX(observed_at) AS latest_at,
+                   MIN(position) AS best,
+                   COUNT(position) AS n,
+                   SUM(CASE WHEN position IS NOT NULL THEN observed_at - :since END) / 86400.0 AS sum_x,
+                   SUM(position) AS sum_y,
+                   SUM((observed_at - :since) * position) / 86400.0 AS sum_xy,
+                   SUM(CASE WHEN position IS NOT NULL THEN (observed_at - :since) * (observed_at - :since) END) / (86400.0 * 86400.0) AS sum_xx
+            FROM rank_observations
+            WHERE observed_at >= :since {pair_filter}
+            GROUP BY pair_id
+        )
+        SELECT p.keyword, p.channel_id, s.observations, s.latest_at,
+               (SELECT position FROM rank_observations
+                WHERE pair_id = s.pair_id AND observed_at = s.latest_at),
+               (SELECT position FROM rank_observations
+                WHERE pair_id = s.pair_id AND observed_at >= :since AND observed_at < s.latest_at
+                ORDER BY observed_at DESC LIMIT 1),
+               s.best, s.n, s.sum_x, s.sum_y, s.sum_xy, s.sum_xx
+        FROM stats s JOIN rank_pairs p ON p.id = s.pair_id
+    """, {'since': since, **params}).fetchall()
+
+    movements = []
+    for (keyword_value, channel_value, observations, latest_at, latest, previous, best,
+         n, sum_x, sum_y, sum_xy, sum_xx) in rows:
+        slope = None
+        if n >= 2:
+            denominator = n * sum_xx - sum_x * sum_x
+            if denominator > 0:
+                slope = (n * sum_xy - sum_x * sum_y) / denominator
+
+        if slope is None or abs(slope) < RANK_TREND_THRESHOLD:
+            trend = 'stable'
+        else:
+            trend = 'up' if slope < 0 else 'down'
+
+        movements.append({
+            'keyword': keyword_value,
+            'channel_id': channel_value,
+            'observations': observations,
+            'latest_at': latest_at,
+            'position': latest,
+            'previous_position': previous,
+            'delta': previous - latest if latest is not None and previous is not None else None,
+            'best_position': best,
+            'slope': round(slope, 3) if slope is not None else None,
+            'trend': trend
+        })
+    return movements
+
+def record_result(result):
+    """Guarda la mejor posición de un resultado de search_channel_position"""
+    try:
+        best_video = result['found_videos'][0] if result.get('found_videos') else None
+        return record_rank(
+            result['keyword'],
+            result['channel_id'],
+            result.get('best_position'),
+            video_id=best_video['video_id'] if best_video else None,
+            searched=result.get('total_searched')
+        )
+    except Exception as e:
+        logging.warning(f"No se pudo guardar el historial de posiciones: {e}")
+        return None
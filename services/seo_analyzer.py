@@ -1,15 +1,11 @@
-import os
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
+from itertools import islice
 import isodate
 from collections import Counter, defaultdict
-
-# Configurar la API de YouTube
-api_key = os.environ.get('YOUTUBE_API_KEY')
-if api_key:
-    youtube = build('youtube', 'v3', developerKey=api_key)
-else:
-    youtube = None
+from services.video_categories import get_category_title
+from services.youtube_api import get_youtube_client
+from services.quota import is_degraded
+from services import serp_store, singleflight
 
 # Funciones auxiliares para formateo
 def format_number(value):
@@ -33,89 +29,106 @@ def format_duration(duration):
     return str(duration) if duration else "00:00"
 
 def search_videos(keyword, max_results=20):
+    videos = []
+    for batch in iter_video_batches(keyword, max_results):
+        videos.extend(batch)
+    return videos
+
+def iter_video_batches(keyword, max_results=20, detail_batch_size=50):
+    """
+    Genera los videos de la búsqueda por lotes, a medida que llega cada página de
+    búsqueda y cada lote de detalles, para poder mostrarlos progresivamente.
+
+    Las páginas de búsqueda se comparten a través de serp_store y la descarga de
+    los detalles de cada lote se coalesce entre peticiones simultáneas, de modo
+    que los informes en streaming de la misma palabra clave no repiten llamadas.
+    """
+    youtube = get_youtube_client()
     if not youtube:
         raise Exception("API de YouTube no configurada. Verifica la variable YOUTUBE_API_KEY")
     
+    # Con el presupuesto de cuota casi agotado solo se consulta una página de búsqueda
+    max_searched = serp_store.SERP_PAGE_SIZE if is_degraded() else None
+    
     try:
-        videos = []
-        next_page_token = None
+        total = 0
+        results = serp_store.iter_search_results(keyword, max_results=max_searched)
         
-        while len(videos) < max_results:
-            request = youtube.search().list(
-                q=keyword,
-                type='video',
-                part='id,snippet',
-                maxResults=50,
-                pageToken=next_page_token
-            )
-            response = request.execute()
+        while total < max_results:
+            batch_items = list(islice(results, detail_batch_size))
+            if not batch_items:
+                break
             
-            for item in response['items']:
-                video_id = item['id']['videoId']
-                video_data = youtube.videos().list(part='contentDetails,statistics,snippet', id=video_id).execute()
-                
-                if 'items' not in video_data or len(video_data['items']) == 0:
-                    continue
-                
-                video_item = video_data['items'][0]
-                
-                duration_str = video_item['contentDetails']['duration']
-                duration = isodate.parse_duration(duration_str)
-                
-                # Filtrar videos que duran más de 1 minuto y 2 segundos
-                if duration < timedelta(minutes=1, seconds=2):
+            # Obtener los detalles de todos los videos del lote en una sola llamada
+            # (los IDs van en una lista para que make_key no los pase a minúsculas)
+            video_ids = [item['id']['videoId'] for item in batch_items]
+            videos_data = singleflight.do(singleflight.make_key('video_details', video_ids),
+                                          get_videos_details, video_ids)
+            
+            batch = []
+            for item in batch_items:
+                video_details = build_video_details(item, videos_data.get(item['id']['videoId']))
+                if not video_details:
                     continue
                 
-                published_at = datetime.strptime(item['snippet']['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
-                day_of_week = published_at.strftime('%A')
-                
-                video_stats = video_item['statistics']
-                
-                video_details = {
-                    'title': item['snippet'].get('title', 'Sin título'),
-                    'published_at': published_at,
-                    'day_of_week': day_of_week,
-                    'views': int(video_stats.get('viewCount', 0)),
-                    'likes': int(video_stats.get('likeCount', 0)),
-                    'comments': int(video_stats.get('commentCount', 0)),
-                    'duration': duration,
-                    'video_url': f"https://www.youtube.com/watch?v={video_id}",
-                    'thumbnail_url': item['snippet'].get('thumbnails', {}).get('medium', {}).get('url', ''),
-                    'category': get_video_category(video_item['snippet'].get('categoryId', '')),
-                    'channel_title': item['snippet'].get('channelTitle', 'Desconocido')
-                }
-                
-                videos.append(video_details)
-                
-                if len(videos) == max_results:
+                batch.append(video_details)
+                if total + len(batch) == max_results:
                     break
             
-            if len(videos) == max_results:
-                break
-            
-            next_page_token = response.get('nextPageToken')
-            if not next_page_token:
-                break
-        
-        return videos
+            total += len(batch)
+            if batch:
+                yield batch
     except Exception as e:
         raise Exception(f"Error al buscar videos: {str(e)}")
 
-def get_video_category(category_id):
-    if not youtube:
-        return "Desconocida"
+def build_video_details(item, video_item):
+    """Construye los datos de un video de la búsqueda, o None si se descarta"""
+    if not video_item:
+        return None
     
-    try:
-        request = youtube.videoCategories().list(
-            part='snippet',
-            id=category_id
-        )
-        response = request.execute()
-        if 'items' in response and len(response['items']) > 0:
-            return response['items'][0]['snippet']['title']
-        return "Desconocida"
-    except Exception as e:
-        return "Desconocida"
+    video_id = item['id']['videoId']
+    duration_str = video_item['contentDetails']['duration']
+    duration = isodate.parse_duration(duration_str)
+    
+    # Filtrar videos que duran más de 1 minuto y 2 segundos
+    if duration < timedelta(minutes=1, seconds=2):
+        return None
+    
+    published_at = datetime.strptime(item['snippet']['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
+    day_of_week = published_at.strftime('%A')
+    
+    video_stats = video_item['statistics']
+    
+    return {
+        'title': item['snippet'].get('title', 'Sin título'),
+        'published_at': published_at,
+        'day_of_week': day_of_week,
+        'views': int(video_stats.get('viewCount', 0)),
+        'likes': int(video_stats.get('likeCount', 0)),
+        'comments': int(video_stats.get('commentCount', 0)),
+        'duration': duration,
+        'video_url': f"https://www.youtube.com/watch?v={video_id}",
+        'thumbnail_url': item['snippet'].get('thumbnails', {}).get('medium', {}).get('url', ''),
+        'category': get_video_category(video_item['snippet'].get('categoryId', '')),
+        'channel_title': item['snippet'].get('channelTitle', 'Desconocido')
+    }
+
+def get_videos_details(video_ids, batch_size=50):
+    """Obtiene los detalles de varios videos con una llamada a videos.list por cada lote de hasta 50 IDs"""
+    youtube = get_youtube_client()
+    details = {}
+    for start in range(0, len(video_ids), batch_size):
+        batch = video_ids[start:start + batch_size]
+        response = youtube.videos().list(
+            part='contentDetails,statistics,snippet',
+            id=','.join(batch)
+        ).execute()
+        for video_item in response.get('items', []):
+            details[video_item['id']] = video_item
+    return details
+
+def get_video_category(category_id):
+    return get_category_title(get_youtube_client(), category_id)
 
 def calculate_average_duration(videos):
     if not videos:
@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+
+from config import SERP_SNAPSHOT_TTL
+from services.cache_store import TTLCache
+from services.youtube_api import get_youtube_client
+from services import singleflight
+
+# Resultados por página de search.list: siempre se piden páginas completas
+# porque cada página cuesta 100 unidades de cuota sea cual sea su tamaño
+SERP_PAGE_SIZE = 50
+
+_snapshots = TTLCache('serp_snapshots', default_ttl=SERP_SNAPSHOT_TTL)
+_stats_lock = threading.Lock()
+_page_stats = {'served': 0, 'fetched': 0}
+
+def snapshot_key(query, order='relevance', region=None, language=None):
+    return singleflight.make_key('serp', query, order, region, language)
+
+def _count(field):
+    with _stats_lock:
+        _page_stats[field] += 1
+
+def _fetch_page(query, order, region, language, page_token):
+    youtube = get_youtube_client()
+    if not youtube:
+        raise Exception("API de YouTube no configurada. Verifica la variable YOUTUBE_API_KEY")
+
+    params = {
+        'q': query,
+        'type': 'video',
+        'part': 'id,snippet',
+        'maxResults': SERP_PAGE_SIZE,
+        'order': order
+    }
+    if page_token:
+        params['pageToken'] = page_token
+    if region:
+        params['regionCode'] = region
+    if language:
+        params['relevanceLanguage'] = language
+
+    response = youtube.search().list(**params).execute()
+    return {'items': response.get('items', []), 'next_page_token': response.get('nextPageToken')}
+
+def _extend(key, snapshot, query, order, region, language):
+    """
+    Añade la siguiente página a la instantánea y la guarda para el resto de su
+    ventana de caducidad. La descarga de cada página (identificada por su número
+    y el token de la anterior) se coalesce entre hilos y workers; si otro ya
+    guardó una instantánea más larga que continúa la misma página, se usa esa.
+    """
+    pages = len(snapshot['pages'])
+    token = snapshot['pages'][-1]['next_page_token'] if pages else None
+
+    stored = _snapshots.get(key)
+    if stored and len(stored['pages']) > pages and (
+            not pages or stored['pages'][pages - 1]['next_page_token'] == token):
+        _count('served')
+        return stored
+
+    logging.info(f"Descargando la página {pages + 1} de la búsqueda {key}")
+    page_key = singleflight.make_key('serp_page', key, pages, token)
+    page = singleflight.do(page_key, _fetch_page, query, order, region, language, token)
+    _count('fetched')
+
+    snapshot = {**snapshot, 'pages': snapshot['pages'] + [page]}
+    remaining = snapshot['created_at'] + SERP_SNAPSHOT_TTL - time.time()
+    if remaining > 0:
+        _snapshots.set(key, snapshot, remaining)
+    return snapshot
+
+def iter_search_results(query, order='relevance', region=None, language=None, max_results=None):
+    """
+    Genera los resultados (items de search.list, videos) de una búsqueda en orden
+    de posición, pidiendo páginas a la API solo cuando el consumidor llega al
+    final de las ya descargadas.
+
+    Las páginas se guardan en una instantánea compartida por todos los informes y
+    workers (clave: consulta normalizada, orden, región e idioma) durante
+    SERP_SNAPSHOT_TTL segundos desde la primera página, de modo que cada página
+    de una búsqueda se descarga como mucho una vez en ese intervalo aunque la
+    consulten el análisis SEO, la posición de canal y la comparación de miniaturas.
+
+    Args:
+        max_results (int): Número máximo de resultados a generar (None: hasta
+                           agotar la búsqueda)
+    """
+    query = ' '.join(query.split())
+    key = snapshot_key(query, order, region, language)
+    snapshot = _snapshots.get(key) or {'created_at': time.time(), 'pages': []}
+
+    produced = 0
+    page_index = 0
+    while max_results is None or produced < max_results:
+        if page_index < len(snapshot['pages']):
+            _count('served')
+        elif page_index and not snapshot['pages'][-1]['next_page_token']:
+            return
+        else:
+            snapshot = _extend(key, snapshot, query, order, region, language)
+
+        for item in snapshot['pages'][page_index]['items']:
+            yield item
+            produced += 1
+            if max_results is not None and produced >= max_results:
+                return
+        page_index += 1
+
+def get_search_results(query, max_results, order='relevance', region=None, language=None):
+    return list(iter_search_results(query, order, region, language, max_results))
+
+def get_serp_stats():
+    """Páginas de búsqueda servidas desde instantáneas y descargadas de la API (de este worker)"""
+    with _stats_lock:
+        stats = dict(_page_stats)
+    total = stats['served'] + stats['fetched']
+    stats['reuse_ratio'] = round(stats['served'] / total, 3) if total else None
+    return stats
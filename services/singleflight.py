@@ -0,0 +1,149 @@
+import os
+import copy
+import json
+import time
+import uuid
+import logging
+import threading
+
+from config import SINGLEFLIGHT_LEASE_SECONDS, SINGLEFLIGHT_RESULT_TTL
+from services.cache_store import get_connection, serialize, deserialize
+from services import quota
+
+# Intervalo de sondeo de los seguidores de otros workers
+POLL_INTERVAL = 0.25
+
+_calls = {}
+_lock = threading.Lock()
+_table_ready_pid = None
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+def _connection():
+    global _table_ready_pid
+    connection = get_connection()
+    if _table_ready_pid != os.getpid():
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS singleflight (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                lease_expires REAL NOT NULL,
+                result BLOB,
+                result_expires REAL
+            )
+        """)
+        _table_ready_pid = os.getpid()
+    return connection
+
+def make_key(namespace, *args):
+    """Clave a partir de los argumentos normalizados (espacios y mayúsculas en los textos)"""
+    normalized = [' '.join(arg.split()).casefold() if isinstance(arg, str) else arg for arg in args]
+    return f"{namespace}:{json.dumps(normalized, ensure_ascii=False, default=str)}"
+
+def _follower_result(result):
+    """
+    Resultado de la ejecución de otro hilo o worker con el consumo de cuota de la
+    petición actual: el del líder no es de esta petición (normalmente, 0 unidades)
+    """
+    if isinstance(result, dict) and 'quota' in result:
+        result = {**result, 'quota': quota.get_request_usage()}
+    return result
+
+def do(key, fn, *args, **kwargs):
+    """
+    Ejecuta fn(*args, **kwargs) una sola vez para todas las peticiones concurrentes
+    con la misma clave.
+
+    Dentro de un proceso, los seguidores esperan al hilo líder y reciben una copia
+    de su resultado; el líder también devuelve una copia, de modo que quien
+    modifique el suyo no altera el que los seguidores están copiando. Entre workers, el líder toma un bloqueo con caducidad en el
+    almacén compartido y publica el resultado durante unos segundos; los seguidores
+    de otros workers lo esperan sondeando, o toman el relevo si el líder muere.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        logging.info(f"Esperando a la ejecución en curso de {key}")
+        if call.event.wait(SINGLEFLIGHT_LEASE_SECONDS):
+            if call.error is not None:
+                raise call.error
+            return _follower_result(copy.deepcopy(call.result))
+        return fn(*args, **kwargs)
+
+    try:
+        call.result = _do_across_workers(key, fn, args, kwargs)
+        return copy.deepcopy(call.result)
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.event.set()
+
+def _try_acquire(connection, key, owner):
+    now = time.time()
+    cursor = connection.execute("""
+        INSERT INTO singleflight (key, owner, lease_expires, result, result_expires) VALUES (?, ?, ?, NULL, NULL)
+        ON CONFLICT (key) DO UPDATE SET
+            owner = excluded.owner, lease_expires = excluded.lease_expires, result = NULL, result_expires = NULL
+        WHERE (singleflight.result IS NULL AND singleflight.lease_expires <= ?)
+           OR (singleflight.result IS NOT NULL AND singleflight.result_expires <= ?)
+    """, (key, owner, now + SINGLEFLIGHT_LEASE_SECONDS, now, now))
+    return cursor.rowcount == 1
+
+def _do_across_workers(key, fn, args, kwargs):
+    try:
+        connection = _connection()
+    except Exception as e:
+        logging.warning(f"Almacén compartido no disponible para {key}: {e}")
+        return fn(*args, **kwargs)
+
+    owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+    deadline = time.time() + SINGLEFLIGHT_LEASE_SECONDS
+    while True:
+        try:
+            if _try_acquire(connection, key, owner):
+                break
+            row = connection.execute(
+                'SELECT result, result_expires FROM singleflight WHERE key = ?', (key,)
+            ).fetchone()
+        except Exception as e:
+            logging.warning(f"Error en el bloqueo compartido de {key}: {e}")
+            return fn(*args, **kwargs)
+
+        if row and row[0] is not None and row[1] > time.time():
+            logging.info(f"Resultado de {key} reutilizado de otro worker")
+            return _follower_result(deserialize(row[0]))
+        if time.time() >= deadline:
+            return fn(*args, **kwargs)
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        # Liberar el bloqueo para que los seguidores lo intenten por su cuenta
+        connection.execute('DELETE FROM singleflight WHERE key = ? AND owner = ?', (key, owner))
+        raise
+
+    try:
+        now = time.time()
+        connection.execute(
+            'UPDATE singleflight SET result = ?, result_expires = ? WHERE key = ? AND owner = ?',
+            (serialize(result), now + SINGLEFLIGHT_RESULT_TTL, key, owner)
+        )
+        connection.execute(
+            'DELETE FROM singleflight WHERE result IS NOT NULL AND result_expires <= ?', (now,)
+        )
+    except Exception as e:
+        logging.warning(f"No se pudo publicar el resultado de {key}: {e}")
+        connection.execute('DELETE FROM singleflight WHERE key = ? AND owner = ?', (key, owner))
+    return result
@@ -1,16 +1,10 @@
-import os
 import re
-from googleapiclient.discovery import build
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 import logging
-
-# Configurar la API de YouTube
-api_key = os.environ.get('YOUTUBE_API_KEY')
-if api_key:
-    youtube = build('youtube', 'v3', developerKey=api_key)
-else:
-    youtube = None
+from services.youtube_api import get_youtube_client
+from services.quota import is_degraded, get_request_usage
+from services import serp_store
 
 def extract_video_id(url):
     """Extrae el ID del video de una URL de YouTube"""
@@ -31,6 +25,7 @@ def extract_video_id(url):
 
 def get_video_info(video_url):
     """Obtiene información de un video específico"""
+    youtube = get_youtube_client()
     if not youtube:
         raise Exception("API de YouTube no configurada")
     
@@ -77,22 +72,14 @@ def get_video_info(video_url):
 
 def search_top_videos(keyword, max_results=12):
     """Busca los videos mejor posicionados para una palabra clave"""
+    youtube = get_youtube_client()
     if not youtube:
         raise Exception("API de YouTube no configurada")
     
     try:
         videos = []
         
-        request = youtube.search().list(
-            q=keyword,
-            type='video',
-            part='id,snippet',
-            maxResults=max_results,
-            order='relevance'
-        )
-        response = request.execute()
-        
-        for item in response['items']:
+        for item in serp_store.iter_search_results(keyword, max_results=max_results):
             video_id = item['id']['videoId']
             
             # Obtener estadísticas del video
@@ -132,40 +119,16 @@ def find_user_video_position(videos, user_video_id):
     return None
 
 def search_extended_results(keyword, user_video_id, max_results=50):
-    """Busca más resultados para encontrar la posición real del video del usuario"""
-    if not youtube:
-        raise Exception("API de YouTube no configurada")
-    
+    """
+    Busca más resultados para encontrar la posición real del video del usuario.
+    Los resultados ya descargados por search_top_videos salen de la instantánea
+    de la búsqueda y no se vuelven a pedir.
+    """
     try:
-        position = 1
-        next_page_token = None
-        searched_count = 0
-        
-        while searched_count < max_results:
-            results_to_get = min(50, max_results - searched_count)
-            
-            request = youtube.search().list(
-                q=keyword,
-                type='video',
-                part='id,snippet',
-                maxResults=results_to_get,
-                pageToken=next_page_token,
-                order='relevance'
-            )
-            response = request.execute()
-            
-            for item in response['items']:
-                if item['id']['videoId'] == user_video_id:
-                    return position
-                position += 1
-                searched_count += 1
-                
-                if searched_count >= max_results:
-                    break
-            
-            next_page_token = response.get('nextPageToken')
-            if not next_page_token:
-                break
+        results = serp_store.iter_search_results(keyword, max_results=max_results)
+        for position, item in enumerate(results, start=1):
+            if item['id']['videoId'] == user_video_id:
+                return position
         
         return None  # No encontrado en los primeros max_results
         
@@ -237,8 +200,9 @@ def search_videos_and_compare(keyword, video_url, show_titles=True):
         # Encontrar posición del video del usuario en los top 12
         user_position = find_user_video_position(top_videos, user_video['video_id'])
         
-        # Si no está en los top 12, buscar en más resultados (hasta 50)
-        if not user_position:
+        # Si no está en los top 12, buscar en más resultados (hasta 50). Con el
+        # presupuesto de cuota casi agotado se omite esta búsqueda adicional.
+        if not user_position and not is_degraded():
             user_position = search_extended_results(keyword, user_video['video_id'], 50)
         
         # Si el video del usuario está en los resultados top, lo removemos para evitar duplicados
@@ -266,7 +230,8 @@ def search_videos_and_compare(keyword, video_url, show_titles=True):
             'mobile_view': mobile_view,
             'show_titles': show_titles,
             'total_analyzed': len(top_videos) + 1,
-            'search_date': datetime.now()
+            'search_date': datetime.now(),
+            'quota': get_request_usage()
         }
         
     except Exception as e:
@@ -0,0 +1,125 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+
+from config import CACHE_DIR, THUMBNAIL_INDEX_TTL, THUMBNAIL_CACHE_MAX_BYTES
+from services.cache_store import TTLCache
+from services.http_sessions import get_session
+from services import singleflight
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, 'thumbnails')
+THUMBNAIL_URL = 'https://i.ytimg.com/vi/{video_id}/{rendition}'
+
+# Variante -> versión de la miniatura que ya sirve YouTube con el tamaño adecuado
+# para cada maquetación (no se redimensiona en el servidor):
+# - desktop: cuadrícula de la comparación de miniaturas (~440x180) -> 480x360
+# - mobile: lista móvil (160x90) -> 320x180, el doble para pantallas de alta densidad
+# - medium: listas de los informes SEO y de posición -> 320x180 (la misma versión
+#   que mobile, descargada y guardada una sola vez)
+THUMBNAIL_VARIANTS = {
+    'desktop': 'hqdefault.jpg',
+    'mobile': 'mqdefault.jpg',
+    'medium': 'mqdefault.jpg',
+}
+
+_VIDEO_ID = re.compile(r'[a-zA-Z0-9_-]{11}')
+
+# Índice (video, versión de YouTube) -> hash SHA-256 del contenido guardado en
+# disco. Caduca en minutos: al volver a descargar una miniatura sin cambios se
+# obtiene el mismo hash y el mismo archivo, y si ha cambiado, la nueva versión
+_index = TTLCache('thumbnail_index', default_ttl=THUMBNAIL_INDEX_TTL)
+_lock = threading.Lock()
+_writes = 0
+
+# Cada cuántas descargas se comprueba el tamaño del directorio
+EVICTION_CHECK_INTERVAL = 50
+
+def is_valid_request(video_id, variant):
+    return variant in THUMBNAIL_VARIANTS and bool(_VIDEO_ID.fullmatch(video_id))
+
+def source_url(video_id, variant):
+    return THUMBNAIL_URL.format(video_id=video_id, rendition=THUMBNAIL_VARIANTS[variant])
+
+def _path(digest):
+    return os.path.join(THUMBNAIL_DIR, digest[:2], f"{digest}.jpg")
+
+def _store(content):
+    """Guarda el contenido con su hash como nombre (si ya existe no se reescribe)"""
+    global _writes
+    digest = hashlib.sha256(content).hexdigest()
+    path = _path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+        with _lock:
+            _writes += 1
+            check_size = _writes % EVICTION_CHECK_INTERVAL == 0
+        if check_size:
+            evict()
+    return digest
+
+def _download(video_id, variant):
+    response = get_session('thumbnails').get(source_url(video_id, variant), timeout=10)
+    response.raise_for_status()
+    if not response.headers.get('Content-Type', '').startswith('image/'):
+        raise ValueError(f"Respuesta inesperada ({response.headers.get('Content-Type')})")
+    return _store(response.content)
+
+def get_thumbnail(video_id, variant):
+    """
+    Devuelve (ruta, hash) de la miniatura en la caché de disco, descargándola de
+    i.ytimg.com solo si no está. Los archivos se nombran por el hash de su
+    contenido, de modo que las variantes o videos con la misma imagen comparten
+    archivo y el hash sirve como ETag. Devuelve None si no se pudo descargar.
+    """
+    key = f"{video_id}:{THUMBNAIL_VARIANTS[variant]}"
+    digest = _index.get(key)
+    if digest and os.path.exists(_path(digest)):
+        return _path(digest), digest
+
+    try:
+        digest = singleflight.do(singleflight.make_key('thumbnail', key), _download, video_id, variant)
+    except Exception as e:
+        logging.warning(f"No se pudo descargar la miniatura {key}: {e}")
+        return None
+
+    _index.set(key, digest)
+    return _path(digest), digest
+
+def evict():
+    """Si el directorio supera THUMBNAIL_CACHE_MAX_BYTES, borra los archivos más antiguos"""
+    files = []
+    for root, _, names in os.walk(THUMBNAIL_DIR):
+        for name in names:
+            if not name.endswith('.jpg'):
+                continue
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+    total_size = sum(size for _, size, _ in files)
+    if total_size <= THUMBNAIL_CACHE_MAX_BYTES:
+        return
+
+    # Liberar hasta quedar en el 90% del límite para no desalojar en cada descarga
+    to_free = total_size - int(THUMBNAIL_CACHE_MAX_BYTES * 0.9)
+    freed = 0
+    removed = 0
+    for _, size, path in sorted(files):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        freed += size
+        removed += 1
+        if freed >= to_free:
+            break
+    logging.info(f"Caché de miniaturas: desalojados {removed} archivos ({freed} bytes)")
@@ -1,32 +1,54 @@
-import os
-from googleapiclient.discovery import build
-from datetime import datetime, timedelta
+from datetime import datetime
+import time
 import logging
-from collections import defaultdict
+from array import array
+from bisect import bisect_left
+from services.youtube_api import get_youtube_client
+from config import ACTIVITY_WINDOWS_DAYS
+from services.quota import get_request_usage
+from services import comment_timeline
 
-# Configurar la API de YouTube
-api_key = os.environ.get('YOUTUBE_API_KEY')
-if api_key:
-    youtube = build('youtube', 'v3', developerKey=api_key)
-else:
-    youtube = None
+# Días de comentarios que usa el histograma diario de la distribución; los
+# comentarios anteriores a esta ventana y al periodo principal no se descargan
+DISTRIBUTION_DAYS = 90
 
-def analyze_video_activity(video_id, period_days=30, max_comments=2000):
+SECONDS_PER_DAY = 86400
+
+def parse_timestamp(value):
+    """Segundos epoch de una fecha ISO 8601 de la API ('2024-01-31T12:00:00Z')"""
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+def analyze_video_activity(video_id, period_days=30, max_comments=2000, windows_days=ACTIVITY_WINDOWS_DAYS):
     """
     Analiza la actividad reciente de un video basándose en comentarios
+    
+    Args:
+        period_days (int): Ventana de la estimación principal
+        windows_days (iterable): Ventanas (en días) con estimación propia, para
+                                 comparar la velocidad del video; se calculan
+                                 todas con los mismos comentarios, sin ampliar
+                                 la descarga: las que la línea temporal guardada
+                                 no cubre se marcan como parciales
     """
-    if not youtube:
+    if not get_youtube_client():
         raise Exception("API de YouTube no configurada")
     
     try:
         # Obtener información básica del video
         video_info = get_video_info(video_id)
         
-        # Obtener comentarios con fechas
-        comments = get_video_comments(video_id, max_comments)
+        windows_days = sorted({days for days in windows_days if days > 0} | {period_days})
+        
+        # Fechas de los comentarios de la distribución y el periodo principal: de
+        # la línea temporal guardada más los comentarios nuevos desde el último
+        # análisis. Las ventanas más largas usan lo que ya esté guardado
+        since = int(time.time()) - max(DISTRIBUTION_DAYS, period_days) * SECONDS_PER_DAY
+        comment_times, covered_since = get_comment_timeline(video_id, max_comments, since=since)
         
         # Analizar distribución temporal de comentarios
-        activity_analysis = analyze_comment_distribution(comments, video_info['published_at'])
+        activity_analysis = analyze_comment_distribution(
+            comment_times, video_info['published_at'], windows_days, covered_since
+        )
         
         # Calcular métricas de actividad reciente
         recent_metrics = calculate_recent_activity(
@@ -39,9 +61,11 @@ def analyze_video_activity(video_id, period_days=30, max_comments=2000):
         
         return {
             'video_info': video_info,
-            'total_comments_analyzed': len(comments),
+            'total_comments_analyzed': len(comment_times),
             'recent_metrics': recent_metrics,
-            'period_days': period_days
+            'period_days': period_days,
+            'windows_days': windows_days,
+            'quota': get_request_usage()
         }
         
     except Exception as e:
@@ -49,6 +73,7 @@ def analyze_video_activity(video_id, period_days=30, max_comments=2000):
 
 def get_video_info(video_id):
     """Obtiene información básica del video"""
+    youtube = get_youtube_client()
     request = youtube.videos().list(
         part='snippet,statistics',
         id=video_id
@@ -72,12 +97,33 @@ def get_video_info(video_id):
         'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', '')
     }
 
-def get_video_comments(video_id, max_results=2000):
-    """Obtiene comentarios del video con sus fechas"""
-    comments = []
+def crawl_comment_threads(video_id, max_results=2000, since=None, watermark=None, watermark_ids=()):
+    """
+    Descarga los hilos de comentarios del video, del más reciente al más antiguo
+    (order='time'), hasta `max_results` comentarios y respuestas.
+    
+    - since (segundos epoch): termina en la primera página cuyo último hilo (el
+      más antiguo) es anterior a esa fecha; las páginas siguientes solo tienen
+      comentarios fuera de la ventana. Se mira el último hilo y no el más antiguo
+      de la página porque el comentario fijado aparece el primero aunque sea antiguo.
+    - watermark / watermark_ids: solo se devuelven los hilos posteriores a la
+      marca de agua (o de su mismo segundo con otro ID) y se termina en la
+      primera página que la alcanza.
+    
+    Las respuestas solo se obtienen con su hilo: las respuestas nuevas a hilos
+    anteriores a la ventana o a la marca de agua no se cuentan.
+    
+    Returns:
+        tuple: ([(thread_id, thread_time, reply_times), ...], motivo del final:
+               'window', 'watermark', 'exhausted', 'limit' o 'error')
+    """
+    youtube = get_youtube_client()
+    threads = []
+    count = 0
     next_page_token = None
+    pages = 0
     
-    while len(comments) < max_results:
+    while count < max_results:
         try:
             request = youtube.commentThreads().list(
                 part='snippet,replies',
@@ -87,80 +133,163 @@ def get_video_comments(video_id, max_results=2000):
                 order='time'
             )
             response = request.execute()
+            pages += 1
+        except Exception as e:
+            logging.warning(f"Error obteniendo comentarios: {e}")
+            return threads, 'error'
+        
+        thread_time = None
+        limited = False
+        for item in response.get('items', []):
+            # Comentario principal
+            thread_time = parse_timestamp(item['snippet']['topLevelComment']['snippet']['publishedAt'])
+            if watermark is not None and (thread_time < watermark or
+                                          (thread_time == watermark and item['id'] in watermark_ids)):
+                continue
             
-            for item in response.get('items', []):
-                # Comentario principal
-                top_comment = item['snippet']['topLevelComment']['snippet']
-                comments.append({
-                    'published_at': datetime.strptime(top_comment['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"),
-                    'type': 'comment'
-                })
-                
-                # Respuestas
-                if 'replies' in item:
-                    for reply in item['replies']['comments']:
-                        reply_snippet = reply['snippet']
-                        comments.append({
-                            'published_at': datetime.strptime(reply_snippet['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"),
-                            'type': 'reply'
-                        })
-                
-                if len(comments) >= max_results:
-                    break
+            # Respuestas
+            reply_times = [
+                parse_timestamp(reply['snippet']['publishedAt'])
+                for reply in item.get('replies', {}).get('comments', [])
+            ]
+            threads.append((item['id'], thread_time, reply_times))
+            count += 1 + len(reply_times)
             
-            next_page_token = response.get('nextPageToken')
-            if not next_page_token:
+            if count >= max_results:
+                limited = True
                 break
-                
-        except Exception as e:
-            logging.warning(f"Error obteniendo comentarios: {e}")
-            break
+        
+        if watermark is not None and thread_time is not None and thread_time <= watermark:
+            logging.info(f"Comentarios de {video_id}: marca de agua alcanzada tras {pages} páginas")
+            return threads, 'watermark'
+        if since and thread_time is not None and thread_time < since:
+            logging.info(f"Comentarios de {video_id}: ventana cubierta tras {pages} páginas")
+            return threads, 'window'
+        # Cortada a mitad de página: quedan hilos sin descargar aunque sea la última
+        if limited:
+            return threads, 'limit'
+        
+        next_page_token = response.get('nextPageToken')
+        if not next_page_token:
+            return threads, 'exhausted'
+    
+    return threads, 'limit'
+
+def get_video_comments(video_id, max_results=2000, since=None):
+    """
+    Obtiene las fechas de los comentarios y respuestas del video (ver
+    crawl_comment_threads), sin usar la línea temporal guardada.
     
-    return comments
+    Returns:
+        array: Segundos epoch de cada comentario ('q', ordenados de más antiguo
+               a más reciente), para contar ventanas con bisect
+    """
+    threads, _ = crawl_comment_threads(video_id, max_results, since=since)
+    return array('q', sorted(
+        comment_time
+        for _, thread_time, reply_times in threads
+        for comment_time in [thread_time, *reply_times]
+    ))
 
-def analyze_comment_distribution(comments, video_published_date):
-    """Analiza la distribución temporal de comentarios"""
-    now = datetime.now()
+def get_comment_timeline(video_id, max_results=2000, since=0):
+    """
+    Fechas de los comentarios del video desde `since` (segundos epoch) a partir de
+    su línea temporal guardada: si ya cubre desde esa fecha, solo se descargan las
+    páginas con hilos posteriores a su marca de agua (normalmente una), de modo
+    que el coste depende de la actividad nueva y no del historial. Si no existe,
+    no cubre la ventana (y su última descarga completa no se cortó por
+    `max_results`) o hay más comentarios nuevos que `max_results`, se descarga la
+    ventana completa y se sustituye.
     
-    # Inicializar contadores
-    distribution = {
-        'by_day': defaultdict(int),
-        'last_30_days': 0
-    }
+    Returns:
+        tuple: (array de segundos epoch ordenados, que puede incluir comentarios
+               anteriores a `since`; fecha desde la que está completo)
+    """
+    timeline = comment_timeline.get_timeline(video_id)
+    # Una línea temporal cortada por max_results tampoco se ampliaría descargándola
+    # de nuevo: se actualiza igual y las ventanas que no cubre se marcan incompletas
+    if timeline and (timeline['covered_since'] <= since or timeline['capped']):
+        threads, reason = crawl_comment_threads(
+            video_id, max_results, watermark=timeline['watermark'], watermark_ids=timeline['watermark_ids']
+        )
+        if reason == 'error':
+            return timeline['times'], timeline['covered_since']
+        if reason != 'limit':
+            logging.info(f"Comentarios de {video_id}: {len(threads)} hilos nuevos desde el último análisis")
+            return comment_timeline.merge_threads(video_id, threads), timeline['covered_since']
     
-    # Fecha límite (30 días)
-    thirty_days_ago = now - timedelta(days=30)
+    threads, reason = crawl_comment_threads(video_id, max_results, since=since)
+    if reason == 'exhausted':
+        covered_since = 0
+    elif reason == 'window':
+        covered_since = since
+    elif threads:
+        # Descarga cortada por el límite o un error: completa desde su último hilo
+        # (el más antiguo, salvo el comentario fijado, que va el primero)
+        covered_since = threads[-1][1]
+    else:
+        return array('q'), int(time.time())
+    times = comment_timeline.replace_timeline(video_id, threads, covered_since, capped=(reason == 'limit'))
+    return times, covered_since
+
+def count_since(comment_times, since):
+    """Comentarios posteriores a `since` en un array ordenado de segundos epoch"""
+    return len(comment_times) - bisect_left(comment_times, since)
+
+def count_by_day(comment_times, since):
+    """
+    Comentarios por día UTC ('YYYY-MM-DD') desde `since`. Cada día se delimita
+    con una búsqueda binaria, sin recorrer los comentarios uno a uno.
+    """
+    by_day = {}
+    start = bisect_left(comment_times, since)
+    while start < len(comment_times):
+        day = comment_times[start] // SECONDS_PER_DAY
+        end = bisect_left(comment_times, (day + 1) * SECONDS_PER_DAY, start)
+        by_day[time.strftime('%Y-%m-%d', time.gmtime(day * SECONDS_PER_DAY))] = end - start
+        start = end
+    return by_day
+
+def count_windows(comment_times, windows_days, now):
+    """Comentarios de cada ventana ({días: comentarios}), con una búsqueda binaria por ventana"""
+    return {days: count_since(comment_times, now - days * SECONDS_PER_DAY) for days in windows_days}
+
+def analyze_comment_distribution(comment_times, video_published_date, windows_days=(30,), covered_since=0):
+    """
+    Analiza la distribución temporal de comentarios (array ordenado de segundos
+    epoch). Una ventana es completa si los comentarios cubren todo su periodo
+    (`covered_since`: fecha desde la que están todos).
+    """
+    now = time.time()
     
-    for comment in comments:
-        date = comment['published_at']
-        
+    distribution = {
         # Por día (últimos 90 días para tener contexto)
-        if date >= now - timedelta(days=90):
-            day_key = date.strftime('%Y-%m-%d')
-            distribution['by_day'][day_key] += 1
-        
-        # Contador de últimos 30 días
-        if date >= thirty_days_ago:
-            distribution['last_30_days'] += 1
+        'by_day': count_by_day(comment_times, now - DISTRIBUTION_DAYS * SECONDS_PER_DAY),
+        # Comentarios de cada ventana de actividad
+        'windows': count_windows(comment_times, windows_days, now),
+        'complete_windows': {days: covered_since <= now - days * SECONDS_PER_DAY for days in windows_days}
+    }
     
     # Calcular edad del video en días
-    video_age_days = (now - video_published_date).days
+    video_age_days = (datetime.now() - video_published_date).days
     distribution['video_age_days'] = video_age_days
     
     return distribution
 
-def calculate_view_estimates(total_views, total_comments, period_comments, video_age_days):
+def calculate_view_estimates(total_views, total_comments, period_comments, video_age_days, window_comments=None):
     """
     Calcula estimaciones de visualizaciones usando el método de 3 tasas
+    
+    Si se pasa window_comments ({días: comentarios}), el resultado incluye en
+    'windows' la estimación de cada ventana ({días: {'low', 'medium', 'high'}}),
+    calculada con las mismas tasas.
     """
     # Evitar división por cero
-    if total_views == 0 or total_comments == 0 or period_comments == 0:
-        return {
-            'low': 0,
-            'medium': 0,
-            'high': 0,
-            'confidence': 'low'
-        }
+    if total_views == 0 or total_comments == 0:
+        estimates = {'low': 0, 'medium': 0, 'high': 0, 'confidence': 'low'}
+        if window_comments is not None:
+            estimates['windows'] = {days: {'low': 0, 'medium': 0, 'high': 0} for days in window_comments}
+        return estimates
     
     # 1. Calcular tasa histórica
     historical_rate = total_comments / total_views
@@ -192,24 +321,25 @@ def calculate_view_estimates(total_views, total_comments, period_comments, video
     high_rate = historical_rate * low_multiplier    # Menos comentarios por vista = más vistas
     
     # 4. Calcular estimaciones
-    low_estimate = int(period_comments / high_rate) if high_rate > 0 else 0
-    medium_estimate = int(period_comments / medium_rate) if medium_rate > 0 else 0
-    high_estimate = int(period_comments / low_rate) if low_rate > 0 else 0
+    def estimate(comments):
+        return {
+            'low': int(comments / high_rate) if high_rate > 0 else 0,
+            'medium': int(comments / medium_rate) if medium_rate > 0 else 0,
+            'high': int(comments / low_rate) if low_rate > 0 else 0
+        }
     
-    # 5. Determinar nivel de confianza
-    if total_comments < 100:
+    # 5. Determinar nivel de confianza (sin comentarios en el periodo no hay base)
+    if period_comments == 0 or total_comments < 100:
         confidence = 'low'
     elif total_comments < 1000:
         confidence = 'medium'
     else:
         confidence = 'high'
     
-    return {
-        'low': low_estimate,
-        'medium': medium_estimate,
-        'high': high_estimate,
-        'confidence': confidence
-    }
+    estimates = {**estimate(period_comments), 'confidence': confidence}
+    if window_comments is not None:
+        estimates['windows'] = {days: estimate(comments) for days, comments in window_comments.items()}
+    return estimates
 
 def get_age_factor(video_age_days):
     """Retorna el factor de ajuste según la edad del video"""
@@ -230,23 +360,37 @@ def calculate_recent_activity(distribution, total_views, total_comments, period_
     """Calcula métricas de actividad reciente con el método de 3 tasas"""
     
     video_age_days = distribution['video_age_days']
-    period_comments = distribution['last_30_days']
+    period_comments = distribution['windows'][period_days]
     
-    # Calcular estimaciones usando el método de 3 tasas
+    # Calcular estimaciones usando el método de 3 tasas (la del periodo y la de
+    # cada ventana)
     view_estimates = calculate_view_estimates(
         total_views, 
         total_comments, 
         period_comments,
-        video_age_days
+        video_age_days,
+        distribution['windows']
     )
     
+    # Velocidad de cada ventana: visualizaciones estimadas por día
+    windows = [
+        {
+            'days': days,
+            'comments': comments,
+            'complete': distribution['complete_windows'][days],
+            'estimates': view_estimates['windows'][days],
+            'views_per_day': view_estimates['windows'][days]['medium'] // days
+        }
+        for days, comments in sorted(distribution['windows'].items())
+    ]
+    
     # Calcular porcentajes del total
     percent_low = (view_estimates['low'] / total_views * 100) if total_views > 0 else 0
     percent_medium = (view_estimates['medium'] / total_views * 100) if total_views > 0 else 0
     percent_high = (view_estimates['high'] / total_views * 100) if total_views > 0 else 0
     
     # Generar interpretación
-    interpretation = get_interpretation(percent_medium, video_age_days)
+    interpretation = get_interpretation(percent_medium, video_age_days, period_days)
     
     # Formatear edad del video
     if video_age_days < 30:
@@ -266,18 +410,19 @@ def calculate_recent_activity(distribution, total_views, total_comments, period_
             'medium': round(percent_medium, 1),
             'high': round(percent_high, 1)
         },
+        'windows': windows,
         'interpretation': interpretation,
         'video_age': age_text,
         'video_age_days': video_age_days
     }
 
-def get_interpretation(percent_medium, video_age_days):
+def get_interpretation(percent_medium, video_age_days, period_days=30):
     """Genera una interpretación basada en el porcentaje de vistas recientes"""
     if percent_medium > 10:
         return {
             'title': 'Video muy activo',
             'icon': '🔥',
-            'text': 'Está recibiendo una cantidad significativa de visualizaciones recientemente. Representa más del 10% de todas sus vistas históricas en solo 30 días.',
+            'text': f'Está recibiendo una cantidad significativa de visualizaciones recientemente. Representa más del 10% de todas sus vistas históricas en solo {period_days} días.',
             'class': 'very-active'
         }
     elif percent_medium > 5:
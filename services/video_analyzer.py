@@ -1,10 +1,10 @@
 import os
-from googleapiclient.discovery import build
 import logging
 from datetime import datetime
+from services.youtube_api import get_youtube_client, is_youtube_configured
+from services.quota import get_request_usage
 
 # Configurar APIs
-api_key = os.environ.get('YOUTUBE_API_KEY')
 openai_api_key = os.environ.get('OPENAI_API_KEY')
 
 # Importar OpenAI directamente (versión 1.0+)
@@ -20,17 +20,16 @@ except Exception as e:
     client = None
     print(f"❌ Error importando OpenAI: {e}")
 
-if api_key:
-    youtube = build('youtube', 'v3', developerKey=api_key)
-    print("✅ YouTube API inicializada")
+if is_youtube_configured():
+    print("✅ YouTube API configurada")
 else:
-    youtube = None
     print("❌ YOUTUBE_API_KEY no encontrada")
 
 def get_video_transcript(video_id):
     """
     Obtiene la transcripción de un video de YouTube
     """
+    youtube = get_youtube_client()
     if not youtube:
         raise Exception("API de YouTube no configurada")
     
@@ -192,7 +191,8 @@ TRANSCRIPCIÓN:
             'analysis': analysis,
             'transcript_length': len(transcript.split()),
             'analyzed_at': datetime.now(),
-            'transcript_preview': transcript[:300] + "..." if len(transcript) > 300 else transcript
+            'transcript_preview': transcript[:300] + "..." if len(transcript) > 300 else transcript,
+            'quota': get_request_usage()
         }
         
     except Exception as e:
@@ -212,5 +212,5 @@ def format_analysis_for_display(analysis_result):
 
 # Debug al importar
 print("🚀 Video Analyzer cargado")
-print(f"   YouTube API: {'✅' if youtube else '❌'}")
+print(f"   YouTube API: {'✅' if is_youtube_configured() else '❌'}")
 print(f"   OpenAI: {'✅' if client else '❌'}")
\ No newline at end of file
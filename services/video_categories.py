@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from config import CACHE_DIR, CATEGORY_REGION
+
+# Las categorías casi nunca cambian: se conservan 30 días en memoria y en disco
+CATEGORY_TTL = 30 * 24 * 3600
+UNKNOWN_CATEGORY = "Desconocida"
+
+_tables = {}
+_lock = threading.Lock()
+
+def _table_path(region_code):
+    return os.path.join(CACHE_DIR, f"video_categories_{region_code}.json")
+
+def _read_table(region_code):
+    """Lee la tabla de categorías guardada en disco si sigue vigente"""
+    try:
+        with open(_table_path(region_code), encoding='utf-8') as f:
+            table = json.load(f)
+        if time.time() - table.get('loaded_at', 0) < CATEGORY_TTL:
+            return table
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _write_table(region_code, table):
+    """Guarda la tabla en disco de forma atómica para que la compartan todos los workers"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _table_path(region_code)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"No se pudo guardar la tabla de categorías: {e}")
+
+def _parse_categories(response):
+    return {item['id']: item['snippet']['title'] for item in response.get('items', [])}
+
+def load_category_table(youtube, region_code=CATEGORY_REGION):
+    """
+    Devuelve la tabla {category_id: título} de una región, cargándola completa
+    con una sola llamada a videoCategories.list si no está en memoria ni en disco
+    """
+    table = _tables.get(region_code)
+    if table and time.time() - table['loaded_at'] < CATEGORY_TTL:
+        return table['categories']
+    
+    with _lock:
+        table = _tables.get(region_code)
+        if table and time.time() - table['loaded_at'] < CATEGORY_TTL:
+            return table['categories']
+        
+        table = _read_table(region_code)
+        if not table:
+            response = youtube.videoCategories().list(
+                part='snippet',
+                regionCode=region_code
+            ).execute()
+            table = {'loaded_at': time.time(), 'categories': _parse_categories(response)}
+            _write_table(region_code, table)
+            logging.info(f"Tabla de categorías cargada para {region_code}: {len(table['categories'])} categorías")
+        
+        _tables[region_code] = table
+        return table['categories']
+
+def get_category_title(youtube, category_id, region_code=CATEGORY_REGION):
+    """Obtiene el título de una categoría; los IDs desconocidos se consultan y se añaden a la tabla"""
+    if not youtube or not category_id:
+        return UNKNOWN_CATEGORY
+    
+    try:
+        categories = load_category_table(youtube, region_code)
+        if category_id in categories:
+            return categories[category_id] or UNKNOWN_CATEGORY
+        
+        response = youtube.videoCategories().list(
+            part='snippet',
+            id=category_id
+        ).execute()
+        title = _parse_categories(response).get(category_id)
+        
+        with _lock:
+            # Los IDs inexistentes se guardan como None para no volver a consultarlos
+            categories[category_id] = title
+            _write_table(region_code, _tables[region_code])
+        
+        return title or UNKNOWN_CATEGORY
+    except Exception as e:
+        logging.warning(f"Error obteniendo la categoría {category_id}: {e}")
+        return UNKNOWN_CATEGORY
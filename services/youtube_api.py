@@ -0,0 +1,58 @@
+import os
+import json
+import logging
+import threading
+
+# Configurar la API de YouTube
+api_key = os.environ.get('YOUTUBE_API_KEY')
+
+# Documento de descubrimiento de YouTube Data API v3 incluido en el repositorio.
+# Generado a partir del documento estático de google-api-python-client 2.108.0
+# (revisión 20231112), conservando solo los recursos que usan los servicios
+# (captions, channels, commentThreads, search, videoCategories, videos) y los
+# esquemas que referencian.
+DISCOVERY_DOCUMENT_PATH = os.path.join(os.path.dirname(__file__), 'discovery', 'youtube.v3.json')
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_local = threading.local()
+
+def is_youtube_configured():
+    """Indica si hay una API key de YouTube configurada"""
+    return bool(api_key)
+
+def get_discovery_document():
+    """Carga y parsea el documento de descubrimiento una sola vez por proceso"""
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                with open(DISCOVERY_DOCUMENT_PATH, encoding='utf-8') as f:
+                    _discovery_document = json.load(f)
+    return _discovery_document
+
+def get_youtube_client():
+    """
+    Devuelve el cliente de YouTube Data API del hilo actual, o None si no hay API key.
+
+    El cliente se construye la primera vez que se necesita (nunca al importar) a
+    partir del documento incluido, sin acceder a la red. Cada hilo tiene su propio
+    cliente porque el transporte HTTP de googleapiclient no es seguro entre hilos;
+    todos comparten el documento ya parseado, por lo que construirlos es barato.
+    Las peticiones pasan por la caché persistente de services.api_cache.
+    """
+    if not api_key:
+        return None
+
+    youtube = getattr(_local, 'youtube', None)
+    if youtube is None:
+        from googleapiclient.discovery import build_from_document
+        from services.api_cache import CachedHttpRequest
+        youtube = build_from_document(
+            get_discovery_document(),
+            developerKey=api_key,
+            requestBuilder=CachedHttpRequest
+        )
+        _local.youtube = youtube
+        logging.debug(f"Cliente de YouTube creado para el hilo {threading.current_thread().name}")
+    return youtube
@@ -0,0 +1,20 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import cache_store  # noqa: E402
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    """Bases SQLite de los servicios en un directorio temporal, con tablas recién creadas"""
+    monkeypatch.setattr(cache_store, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache_store, '_local', threading.local())
+    for name, module in list(sys.modules.items()):
+        if name.startswith('services.') and hasattr(module, '_table_ready_pid'):
+            monkeypatch.setattr(module, '_table_ready_pid', None)
+    return tmp_path
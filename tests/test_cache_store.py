@@ -0,0 +1,37 @@
+import os
+import zlib
+
+import pytest
+
+from services import cache_store
+
+
+def test_cache_values_are_stored_as_json(cache_dir):
+    cache = cache_store.TTLCache('test', default_ttl=60)
+    cache.set('key', {'items': [{'title': 'vídeo', 'views': 3}]})
+
+    data = cache_store.get_connection().execute(
+        "SELECT value FROM cache_entries WHERE namespace = 'test'"
+    ).fetchone()[0]
+
+    assert zlib.decompress(data).startswith(b'{"items"')
+    assert cache.get('key') == {'items': [{'title': 'vídeo', 'views': 3}]}
+
+
+def test_cache_dir_is_created_private(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_store, 'CACHE_DIR', str(tmp_path / 'cache'))
+
+    cache_store._check_cache_dir()
+
+    assert os.stat(tmp_path / 'cache').st_mode & 0o777 == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='permisos POSIX')
+def test_cache_dir_writable_by_others_is_rejected(monkeypatch, tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    monkeypatch.setattr(cache_store, 'CACHE_DIR', str(shared))
+
+    with pytest.raises(PermissionError):
+        cache_store._check_cache_dir()
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from services import singleflight
+
+
+class SlowCopy:
+    """Valor cuya copia tarda: la mutación del resultado ocurre mientras otros lo copian"""
+
+    def __deepcopy__(self, memo):
+        time.sleep(0.1)
+        return SlowCopy()
+
+
+def test_concurrent_callers_can_mutate_their_results(cache_dir):
+    def fetch():
+        time.sleep(0.2)
+        return [{'title': f'video {i}', 'thumbnail': SlowCopy()} for i in range(3)]
+
+    results = []
+    errors = []
+
+    def call():
+        try:
+            videos = singleflight.do(singleflight.make_key('test', 'mutate'), fetch)
+            time.sleep(0.05)
+            # Como assign_video_ids: añadir claves a cada diccionario del resultado
+            for i, video in enumerate(videos):
+                video['video_id'] = f'id{i}'
+            results.append(videos)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == 6
+    assert len({id(videos) for videos in results}) == 6
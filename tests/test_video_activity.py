@@ -0,0 +1,157 @@
+import time
+
+import pytest
+
+from services import comment_timeline, video_activity
+
+
+def iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeCommentThreads:
+    """commentThreads().list() paginado sobre una lista de hilos, del más reciente al más antiguo"""
+
+    def __init__(self, threads, page_size=100):
+        self.threads = threads
+        self.page_size = page_size
+        self.calls = 0
+
+    def list(self, pageToken=None, **kwargs):
+        self.calls += 1
+        start = int(pageToken or 0)
+        page = self.threads[start:start + self.page_size]
+        response = {'items': [
+            {'id': thread_id, 'snippet': {'topLevelComment': {'snippet': {'publishedAt': iso(published)}}}}
+            for thread_id, published in page
+        ]}
+        if start + self.page_size < len(self.threads):
+            response['nextPageToken'] = str(start + self.page_size)
+        return FakeRequest(response)
+
+
+class FakeVideos:
+    def __init__(self, published):
+        self.published = published
+
+    def list(self, **kwargs):
+        return FakeRequest({'items': [{
+            'snippet': {'title': 'Video', 'channelTitle': 'Canal', 'publishedAt': iso(self.published)},
+            'statistics': {'viewCount': '1000000', 'likeCount': '1000', 'commentCount': '5000'}
+        }]})
+
+
+class FakeYouTube:
+    def __init__(self, threads, page_size=100):
+        self.comment_threads = FakeCommentThreads(threads, page_size)
+        self.videos_resource = FakeVideos(min((published for _, published in threads), default=0) - 3600)
+
+    def commentThreads(self):
+        return self.comment_threads
+
+    def videos(self):
+        return self.videos_resource
+
+
+@pytest.fixture
+def fake_youtube(monkeypatch):
+    def install(threads, page_size=100):
+        youtube = FakeYouTube(threads, page_size)
+        monkeypatch.setattr(video_activity, 'get_youtube_client', lambda: youtube)
+        return youtube
+    return install
+
+
+def make_threads(count, newest=None):
+    newest = newest or int(time.time()) - 60
+    return [(f'c{i}', newest - i * 3600) for i in range(count)]
+
+
+def test_limit_inside_last_page_is_reported_as_limit(fake_youtube):
+    fake_youtube(make_threads(80))
+
+    threads, reason = video_activity.crawl_comment_threads('video', max_results=50)
+
+    assert len(threads) == 50
+    assert reason == 'limit'
+
+
+def test_last_page_without_limit_is_exhausted(fake_youtube):
+    fake_youtube(make_threads(80))
+
+    threads, reason = video_activity.crawl_comment_threads('video', max_results=100)
+
+    assert len(threads) == 80
+    assert reason == 'exhausted'
+
+
+def test_limit_across_pages_is_reported_as_limit(fake_youtube):
+    youtube = fake_youtube(make_threads(300))
+
+    threads, reason = video_activity.crawl_comment_threads('video', max_results=150)
+
+    assert len(threads) == 150
+    assert reason == 'limit'
+    assert youtube.comment_threads.calls == 2
+
+
+def test_timeline_cut_by_limit_is_capped_and_updated_incrementally(fake_youtube, cache_dir):
+    threads = make_threads(300)
+    fake_youtube(threads)
+
+    times, covered_since = video_activity.get_comment_timeline('video', max_results=100)
+
+    assert len(times) == 100
+    assert covered_since == threads[99][1]
+    assert comment_timeline.get_timeline('video')['capped']
+
+    newest = threads[0][1]
+    youtube = fake_youtube([('n1', newest + 20), ('n2', newest + 10)] + threads)
+    times, covered_since = video_activity.get_comment_timeline('video', max_results=100)
+
+    assert len(times) == 102
+    assert covered_since == threads[99][1]
+    assert youtube.comment_threads.calls == 1
+    assert comment_timeline.get_timeline('video')['capped']
+
+
+def test_uncapped_timeline_not_covering_window_is_crawled_again(fake_youtube, cache_dir):
+    threads = make_threads(300)
+    fake_youtube(threads)
+    since = threads[0][1] - 49 * 3600
+
+    times, covered_since = video_activity.get_comment_timeline('video', max_results=1000, since=since)
+
+    assert len(times) == 100
+    assert covered_since == since
+    assert not comment_timeline.get_timeline('video')['capped']
+
+    # Tiene más comentarios que el nuevo límite, pero no se cortó por él: se descarga de nuevo
+    times, covered_since = video_activity.get_comment_timeline('video', max_results=20)
+
+    assert len(times) == 20
+    assert covered_since == threads[19][1]
+    assert comment_timeline.get_timeline('video')['capped']
+
+
+def test_activity_windows_do_not_widen_the_crawl(fake_youtube, cache_dir):
+    # Un hilo cada 2 horas durante ~416 días: 90 días son ~1080 hilos (11 páginas)
+    threads = [(f'c{i}', int(time.time()) - 60 - i * 7200) for i in range(5000)]
+    youtube = fake_youtube(threads)
+
+    result = video_activity.analyze_video_activity(
+        'video', period_days=30, max_comments=10000, windows_days=(7, 30, 90, 365)
+    )
+
+    assert youtube.comment_threads.calls == 11
+    windows = {window['days']: window for window in result['recent_metrics']['windows']}
+    assert windows[90]['complete']
+    assert not windows[365]['complete']
@@ -0,0 +1,15 @@
+import argparse
+import logging
+from services.jobs import run_worker, run_supervisor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - worker - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Worker de trabajos en segundo plano')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='lanzar y supervisar este número de workers en lugar de ejecutar uno')
+    args = parser.parse_args()
+    if args.processes:
+        run_supervisor(args.processes)
+    else:
+        run_worker()
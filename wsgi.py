@@ -2,5 +2,11 @@ import os
 from app import app
 
 if __name__ == "__main__":
-    port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    from config import JOB_WORKERS
+    from services.jobs import start_worker_processes, stop_worker_processes
+    job_supervisor = start_worker_processes(JOB_WORKERS)
+    try:
+        port = int(os.environ.get('PORT', 8080))
+        app.run(host='0.0.0.0', port=port)
+    finally:
+        stop_worker_processes(job_supervisor)
\ No newline at end of file